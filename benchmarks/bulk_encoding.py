@@ -0,0 +1,40 @@
+#!/usr/bin/python
+# coding: utf8
+
+"""Seconds to JSON encode a bulk payload of array data.
+
+    python benchmarks/bulk_encoding.py [points]
+
+columns: bulk.Points written from the timestamp and value columns
+per pair lists: the same points as [ts, value] lists (Points.tolist())
+prebuilt lists: encoding lists which already exist (lower bound)
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from sxapi import codec
+from sxapi.bulk import to_points
+
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def main(count=2000000):
+    ts = np.arange(1480773600, 1480773600 + count)
+    values = np.random.rand(count)
+    points = to_points((ts, values))
+    lists = points.tolist()
+    print("codec: {}, {} points".format(codec.NAME, count))
+    print("{:<16} {:>8.3f}".format("columns", timed(lambda: codec.dumps({"data": points}))))
+    print("{:<16} {:>8.3f}".format("per pair lists", timed(lambda: codec.dumps({"data": points.tolist()}))))
+    print("{:<16} {:>8.3f}".format("prebuilt lists", timed(lambda: codec.dumps({"data": lists}))))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# coding: utf8
+
+"""Bytes per model object with __slots__ compared to the same attributes
+in a per instance __dict__ (the layout before the models were slotted).
+
+    python benchmarks/memory_models.py [count]
+
+The raw payloads are created before measuring, they are shared by both
+layouts and not counted.
+"""
+
+import gc
+import sys
+import tracemalloc
+
+import mock
+
+from sxapi.models import Event, Heat, Lactation, Annotation
+
+
+class Unslotted(object):
+    # what APIObject.create_from_data stored before
+    def __init__(self, api, _id, data, timezone):
+        self.api = api
+        self._id = _id
+        self._data = data
+        self._timezone = timezone
+        self._tz_aware = api.tz_aware
+
+
+def measure(create, payloads):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [create(p) for p in payloads]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the objects is not part of the objects
+    return (after - before - sys.getsizeof(objects)) / float(len(objects))
+
+
+def main(count=100000):
+    api = mock.Mock(tz_aware=True)
+    payloads = [{"_id": str(i), "timestamp": 1514764800 + i, "heat_date": 1514764800 + i,
+                 "calving_date": 1514764800 + i, "event_type": "heat", "metadata": {}}
+                for i in range(count)]
+    print("{:<12} {:>10} {:>10}".format("class", "__dict__", "__slots__"))
+    for cls in (Event, Heat, Lactation, Annotation):
+        slotted = measure(lambda data: cls.create_from_data(api=api, data=data, timezone="Europe/Vienna"),
+                          payloads)
+        unslotted = measure(lambda data: Unslotted(api, data["_id"], data, "Europe/Vienna"), payloads)
+        print("{:<12} {:>10.0f} {:>10.0f}".format(cls.__name__, unslotted, slotted))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,42 @@
+#!/usr/bin/python
+# coding: utf8
+
+"""Seconds to turn a /data/query response body into sensordata arrays.
+
+    python benchmarks/sensordata_decode.py [points]
+
+stream: incremental decoder (stream.iter_json_array), used for large
+responses or without Content-Length
+codec: whole body decoded with the codec, converted by collect_arrays,
+used up to BaseAPI.STREAM_MIN_SIZE
+"""
+
+import sys
+import json
+import time
+import random
+
+from sxapi import codec
+from sxapi.low import BaseAPI
+from sxapi.stream import iter_json_array, collect_arrays
+
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def main(count=500000):
+    data = [[1514764800 + i * 600, None if i % 50 == 0 else round(random.uniform(35, 41), 2)]
+            for i in range(count)]
+    body = json.dumps({"metric": "temp", "data": data}).encode("utf-8")
+    chunks = [body[i:i + 64 * 1024] for i in range(0, len(body), 64 * 1024)]
+    print("codec: {}, {} points, {:.1f} MB (STREAM_MIN_SIZE {:.1f} MB)".format(
+        codec.NAME, count, len(body) / 1e6, BaseAPI.STREAM_MIN_SIZE / 1e6))
+    print("{:<8} {:>8.3f}".format("stream", timed(lambda: collect_arrays(iter_json_array(chunks, key="data")))))
+    print("{:<8} {:>8.3f}".format("codec", timed(lambda: collect_arrays(codec.loads(body)["data"]))))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
@@ -7,18 +7,27 @@ import requests
 import warnings
 
 from .low import LowLevelPublicAPI, LowLevelInternAPI
+from .aio import AsyncLowLevelPublicAPI, AsyncLowLevelInternAPI
 from .models import User, Animal, Organisation, Annotation
 from .helper import fromTS, toTS
+from .retry import RetryPolicy, RateLimiter
+from .cache import ResponseCache
+from .store import SensordataStore
+from .bulk import BulkUploadError
+from .writer import BufferedWriter
 
 __version__ = '0.13'
 
 
 class API(object):
-    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True):
+    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True, **kwargs):
         """Initialize a new API client instance.
+
+        Further keyword arguments (max_workers, retry, rate_limiter,
+        pool_maxsize, ...) are passed to the low level client.
         """
         self.low = LowLevelPublicAPI(email=email, password=password, api_key=api_key,
-                                     endpoint=endpoint, tz_aware=tz_aware)
+                                     endpoint=endpoint, tz_aware=tz_aware, **kwargs)
 
     @property
     def status(self):
@@ -28,6 +37,9 @@ class API(object):
         for p in self.low.stats():
             print(p)
 
+    def add_hook(self, event, func):
+        self.low.add_hook(event, func)
+
     @property
     def user(self):
         return User(api=self.low, data=self.low.get_user())
@@ -43,20 +55,26 @@ class API(object):
     def get_animal(self, animal_id):
         return Animal(api=self.low, _id=animal_id)
 
-    def get_organisation(self, organisation_id):
-        return Organisation(api=self.low, _id=organisation_id)
+    def get_organisation(self, organisation_id, eager=False):
+        return Organisation(api=self.low, _id=organisation_id, eager=eager)
 
 
 class LowLevelAPI(object):
     def __init__(self, email=None, password=None, private_endpoint=None, api_key=None,
-                 public_endpoint=None, tz_aware=True):
+                 public_endpoint=None, tz_aware=True, store=None, **kwargs):
         """Initialize a new API client instance.
+
+        store is an optional SensordataStore for the public sensordata calls.
+        Further keyword arguments (max_workers, retry, rate_limiter,
+        pool_maxsize, ...) are passed to the low level clients.
         """
         self.publiclow = LowLevelPublicAPI(email=email, password=password, api_key=api_key,
-                                           endpoint=public_endpoint, tz_aware=tz_aware)
+                                           endpoint=public_endpoint, tz_aware=tz_aware, store=store,
+                                           **kwargs)
         if private_endpoint is not None and api_key is not None:
             self.privatelow = LowLevelInternAPI(endpoint=private_endpoint, api_key=api_key,
-                                                tz_aware=tz_aware)
+                                                tz_aware=tz_aware, **kwargs)
+            self.publiclow.internal = self.privatelow
         else:
             pass
             # self.privatelow = self._privatelow
@@ -66,6 +84,13 @@ class LowLevelAPI(object):
     def _privatelow(self):
         raise RuntimeError("internal API not accessable without endpoint and token")
 
+    def add_hook(self, event, func):
+        """Register a request hook on the public and the internal client.
+        """
+        self.publiclow.add_hook(event, func)
+        if hasattr(self, "privatelow"):
+            self.privatelow.add_hook(event, func)
+
     # Status Calls
 
     def get_public_status(self):
@@ -81,8 +106,8 @@ class LowLevelAPI(object):
     def get_animal_object(self, animal_id):
         return Animal(api=self.publiclow, _id=animal_id)
 
-    def get_organisation_object(self, organisation_id):
-        return Organisation(api=self.publiclow, _id=organisation_id)
+    def get_organisation_object(self, organisation_id, eager=False):
+        return Organisation(api=self.publiclow, _id=organisation_id, eager=eager)
 
     # Low Level
 
@@ -101,15 +126,28 @@ class LowLevelAPI(object):
     def get_organisation_by_id(self, organisation_id):
         return self.publiclow.get_organisation_by_id(organisation_id)
 
-    def get_device_sensordata(self, device_id, metric, from_date, to_date):
+    def get_organisation_animals(self, organisation_id, max_workers=None):
+        return self.publiclow.get_organisation_animals(organisation_id, max_workers=max_workers)
+
+    def get_device_sensordata(self, device_id, metric, from_date, to_date, max_workers=None):
         f = toTS(from_date)
         t = toTS(to_date)
-        return self.publiclow.get_device_sensordata(device_id, metric, f, t)
+        return self.publiclow.get_device_sensordata(device_id, metric, f, t, max_workers=max_workers)
 
-    def get_animal_sensordata(self, animal_id, metric, from_date, to_date):
+    def get_animal_sensordata(self, animal_id, metric, from_date, to_date, max_workers=None):
         f = toTS(from_date)
         t = toTS(to_date)
-        return self.publiclow.get_animal_sensordata(animal_id, metric, f, t)
+        return self.publiclow.get_animal_sensordata(animal_id, metric, f, t, max_workers=max_workers)
+
+    def iter_device_sensordata(self, device_id, metric, from_date, to_date):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return self.publiclow.iter_device_sensordata(device_id, metric, f, t)
+
+    def iter_animal_sensordata(self, animal_id, metric, from_date, to_date):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return self.publiclow.iter_animal_sensordata(animal_id, metric, f, t)
 
     def get_animal_events(self, animal_id, from_date=None, to_date=None):
         f = None
@@ -134,6 +172,30 @@ class LowLevelAPI(object):
         t = toTS(to_date)
         return self.publiclow.get_events_by_organisation(organisation_id, f, t, categories=categories)
 
+    def iter_animal_events(self, animal_id, from_date=None, to_date=None, page_size=100):
+        f = None
+        if from_date is not None:
+            f = toTS(from_date)
+        t = None
+        if to_date is not None:
+            t = toTS(to_date)
+        return self.publiclow.iter_animal_events(animal_id, f, t, page_size=page_size)
+
+    def iter_device_events(self, device_id, from_date=None, to_date=None, page_size=100):
+        f = None
+        if from_date is not None:
+            f = toTS(from_date)
+        t = None
+        if to_date is not None:
+            t = toTS(to_date)
+        return self.publiclow.iter_device_events(device_id, f, t, page_size=page_size)
+
+    def iter_events_by_organisation(self, organisation_id, from_date, to_date, categories=None, page_size=100):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return self.publiclow.iter_events_by_organisation(organisation_id, f, t, categories=categories,
+                                                          page_size=page_size)
+
     def get_animals_by_organisation(self, organisation_id):
         return self.privatelow.get_animals_by_organisation(organisation_id)
 
@@ -156,14 +218,25 @@ class LowLevelAPI(object):
     def updateSensorData(self, device_id, metric, data):
         return self.privatelow.updateSensorData(device_id, metric, data)
 
-    def updateSensorDataBulk(self, sensordata):
-        return self.privatelow.updateSensorDataBulk(sensordata)
+    def updateSensorDataBulk(self, sensordata, **kwargs):
+        return self.privatelow.updateSensorDataBulk(sensordata, **kwargs)
 
     def insertSensorData(self, device_id, metric, data):
         return self.privatelow.insertSensorData(device_id, metric, data)
 
-    def insertSensorDataBulk(self, sensordata):
-        return self.privatelow.insertSensorDataBulk(sensordata)
+    def insertSensorDataBulk(self, sensordata, **kwargs):
+        return self.privatelow.insertSensorDataBulk(sensordata, **kwargs)
+
+    def uploadSensorDataBulk(self, sensordata, **kwargs):
+        return self.privatelow.uploadSensorDataBulk(sensordata, **kwargs)
+
+    def retrySensorDataBulk(self, chunks, **kwargs):
+        return self.privatelow.retrySensorDataBulk(chunks, **kwargs)
+
+    def buffered_writer(self, **kwargs):
+        """BufferedWriter for the internal API, see writer.BufferedWriter.
+        """
+        return BufferedWriter(self.privatelow, **kwargs)
 
     def getSensorData(self, device_id, metric, from_date, to_date):
         return self.privatelow.getSensorData(device_id, metric, from_date, to_date)
@@ -174,6 +247,9 @@ class LowLevelAPI(object):
     def getSensorDataBulk(self, device_id, metrics, from_date, to_date):
         return self.privatelow.getSensorDataBulk(device_id, metrics, from_date, to_date)
 
+    def iterSensorDataBulk(self, device_id, metrics, from_date, to_date):
+        return self.privatelow.iterSensorDataBulk(device_id, metrics, from_date, to_date)
+
     def getLastSensorData(self, device_id, metric):
         return self.privatelow.getLastSensorData(device_id, metric)
 
@@ -251,6 +327,17 @@ class LowLevelAPI(object):
     def get_animal_annotations(self, animal_id, from_date, to_date):
         return self.publiclow.get_animal_annotations(animal_id, from_date, to_date)
 
+    def iter_annotations_by_class(self, annotation_class, from_date, to_date, page_size=100):
+        return self.publiclow.iter_annotations_by_class(annotation_class, from_date, to_date,
+                                                        page_size=page_size)
+
+    def iter_annotations_by_organisation(self, organisation_id, from_date, to_date, page_size=100):
+        return self.publiclow.iter_annotations_by_organisation(organisation_id, from_date, to_date,
+                                                               page_size=page_size)
+
+    def iter_animal_annotations(self, animal_id, from_date, to_date, page_size=100):
+        return self.publiclow.iter_animal_annotations(animal_id, from_date, to_date, page_size=page_size)
+
     def insert_animal_annotation(self, animal_id, ts, end_ts, classes, attributes):
         return self.publiclow.insert_animal_annotation(animal_id=animal_id, ts=ts,
                                                        end_ts=end_ts, classes=classes, attributes=attributes)
@@ -263,6 +350,9 @@ class LowLevelAPI(object):
     def query_organisations(self, name_search_string=None, partner_id=None):
         return self.privatelow.query_organisations(name_search_string, partner_id)
 
+    def iter_organisations(self, name_search_string=None, partner_id=None, page_size=100):
+        return self.privatelow.iter_organisations(name_search_string, partner_id, page_size=page_size)
+
     def update_organisation_partner(self, organisation_id, partner_id):
         return self.privatelow.update_organisation_partner(organisation_id, partner_id)
 
@@ -274,6 +364,9 @@ class LowLevelAPI(object):
     def query_users(self, email_search_string=None):
         return self.privatelow.query_users(email_search_string=email_search_string)
 
+    def iter_users(self, email_search_string=None, page_size=100):
+        return self.privatelow.iter_users(email_search_string=email_search_string, page_size=page_size)
+
     def get_hidden_shares(self, user_id):
         return self.privatelow.get_hidden_shares(user_id)
 
@@ -296,3 +389,271 @@ class LowLevelAPI(object):
 
     def get_testset_by_name(self, name):
         return self.publiclow.get_testset_by_name(name)
+
+
+class AsyncAPI(object):
+    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True,
+                 max_concurrency=50):
+        """Initialize a new asyncio API client instance.
+
+        Objects returned by this client are loaded up front, lazy attributes
+        which need further requests are not available on them.
+        """
+        self.low = AsyncLowLevelPublicAPI(email=email, password=password, api_key=api_key,
+                                          endpoint=endpoint, tz_aware=tz_aware,
+                                          max_concurrency=max_concurrency)
+
+    async def close(self):
+        await self.low.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_status(self):
+        return await self.low.get_status()
+
+    def print_stats(self):
+        for p in self.low.stats():
+            print(p)
+
+    async def get_user(self):
+        return User(api=self.low, data=await self.low.get_user())
+
+    async def get_organisations(self):
+        return [Organisation.create_from_data(api=self.low, data=x, _id=x["organisation_id"])
+                for x in await self.low.get_organisations()]
+
+    async def get_annotation(self, annotation_id):
+        return Annotation.create_from_data(api=self.low, _id=annotation_id,
+                                           data=await self.low.get_annotation_by_id(annotation_id))
+
+    async def get_animal(self, animal_id):
+        data = await self.low.get_animal_by_id(animal_id)
+        timezone = await self.low.get_timezone_for_organisation_id(data["organisation_id"])
+        return Animal.create_from_data(api=self.low, data=data, _id=animal_id, timezone=timezone)
+
+    async def get_organisation(self, organisation_id):
+        return Organisation.create_from_data(api=self.low, _id=organisation_id,
+                                             data=await self.low.get_organisation_by_id(organisation_id))
+
+
+class AsyncLowLevelAPI(object):
+    def __init__(self, email=None, password=None, private_endpoint=None, api_key=None,
+                 public_endpoint=None, tz_aware=True, max_concurrency=50):
+        """Initialize a new asyncio API client instance.
+        """
+        self.publiclow = AsyncLowLevelPublicAPI(email=email, password=password, api_key=api_key,
+                                                endpoint=public_endpoint, tz_aware=tz_aware,
+                                                max_concurrency=max_concurrency)
+        if private_endpoint is not None and api_key is not None:
+            self.privatelow = AsyncLowLevelInternAPI(endpoint=private_endpoint, api_key=api_key,
+                                                     tz_aware=tz_aware, max_concurrency=max_concurrency)
+
+    async def close(self):
+        await self.publiclow.close()
+        if hasattr(self, "privatelow"):
+            await self.privatelow.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # Status Calls
+
+    async def get_public_status(self):
+        return await self.publiclow.get_status()
+
+    async def get_private_status(self):
+        return await self.privatelow.get_status()
+
+    # Calls to Public API
+
+    async def get_organisation_animal_ids(self, organisation_id):
+        return await self.publiclow.get_organisation_animal_ids(organisation_id)
+
+    async def get_animal_by_id(self, animal_id):
+        return await self.publiclow.get_animal_by_id(animal_id)
+
+    async def get_device_by_id(self, device_id):
+        return await self.publiclow.get_device_by_id(device_id)
+
+    async def get_device_uploads(self, from_ts, to_ts, device_id):
+        return await self.privatelow.get_device_uploads(from_ts, to_ts, device_id)
+
+    async def get_organisation_by_id(self, organisation_id):
+        return await self.publiclow.get_organisation_by_id(organisation_id)
+
+    async def get_device_sensordata(self, device_id, metric, from_date, to_date):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return await self.publiclow.get_device_sensordata(device_id, metric, f, t)
+
+    async def get_animal_sensordata(self, animal_id, metric, from_date, to_date):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return await self.publiclow.get_animal_sensordata(animal_id, metric, f, t)
+
+    async def get_animal_events(self, animal_id, from_date=None, to_date=None):
+        f = None
+        if from_date is not None:
+            f = toTS(from_date)
+        t = None
+        if to_date is not None:
+            t = toTS(to_date)
+        return await self.publiclow.get_animal_events(animal_id, f, t)
+
+    async def get_device_events(self, device_id, from_date=None, to_date=None):
+        f = None
+        if from_date is not None:
+            f = toTS(from_date)
+        t = None
+        if to_date is not None:
+            t = toTS(to_date)
+        return await self.publiclow.get_device_events(device_id, f, t)
+
+    async def get_events_by_organisation(self, organisation_id, from_date, to_date, categories=None):
+        f = toTS(from_date)
+        t = toTS(to_date)
+        return await self.publiclow.get_events_by_organisation(organisation_id, f, t, categories=categories)
+
+    async def get_animals_by_organisation(self, organisation_id):
+        return await self.privatelow.get_animals_by_organisation(organisation_id)
+
+    # Old internal calls
+
+    async def updateSensorData(self, device_id, metric, data):
+        return await self.privatelow.updateSensorData(device_id, metric, data)
+
+    async def updateSensorDataBulk(self, sensordata):
+        return await self.privatelow.updateSensorDataBulk(sensordata)
+
+    async def insertSensorData(self, device_id, metric, data):
+        return await self.privatelow.insertSensorData(device_id, metric, data)
+
+    async def insertSensorDataBulk(self, sensordata):
+        return await self.privatelow.insertSensorDataBulk(sensordata)
+
+    async def getSensorData(self, device_id, metric, from_date, to_date):
+        return await self.privatelow.getSensorData(device_id, metric, from_date, to_date)
+
+    async def getSensorDataRange(self, device_id, metric):
+        return await self.privatelow.getSensorDataRange(device_id, metric)
+
+    async def getSensorDataBulk(self, device_id, metrics, from_date, to_date):
+        return await self.privatelow.getSensorDataBulk(device_id, metrics, from_date, to_date)
+
+    async def getLastSensorData(self, device_id, metric):
+        return await self.privatelow.getLastSensorData(device_id, metric)
+
+    async def getLastSensorDataBulk(self, device_id, metrics):
+        return await self.privatelow.getLastSensorDataBulk(device_id, metrics)
+
+    async def insertEvent(self, device_id, event_type, timestamp, value,
+                          metadata, level=10, disable_notifications=False):
+        return await self.privatelow.insertEvent(device_id, event_type, timestamp, value,
+                                                 metadata, level=level,
+                                                 disable_notifications=disable_notifications)
+
+    async def updateEventMeta(self, device_id, _id, event_meta):
+        return await self.privatelow.updateEventMeta(device_id, _id, event_meta)
+
+    async def getLastEventTimestamps(self, device_id):
+        return await self.privatelow.getLastEventTimestamps(device_id)
+
+    async def setDeviceMeta(self, device_id, metadata):
+        return await self.privatelow.setDeviceMeta(device_id, metadata)
+
+    async def getSensorInfo(self, device_id):
+        return await self.privatelow.getSensorInfo(device_id)
+
+    async def deleteEvent(self, event_id):
+        return await self.privatelow.deleteEvent(event_id)
+
+    async def getDevice(self, device_id, with_animal=True, with_organisation=True,
+                        with_allmeta=True):
+        return await self.privatelow.getDevice(device_id, with_animal=with_animal,
+                                               with_organisation=with_organisation,
+                                               with_allmeta=with_allmeta)
+
+    async def get_devices_seen(self, device_id, hours_back=24, return_sum=True, to_ts=None):
+        return await self.privatelow.get_devices_seen(device_id, hours_back, return_sum, to_ts)
+
+    async def getNodeInfos(self, device_id, from_date, to_date):
+        return await self.privatelow.getNodeInfos(device_id, from_date, to_date)
+
+    async def getUploads(self, device_id, from_date, to_date):
+        return await self.privatelow.getUploads(device_id, from_date, to_date)
+
+    async def lastProductionDevices(self, device_id=None, skip=0, limit=10):
+        return await self.privatelow.lastProductionDevices(device_id, skip, limit)
+
+    async def searchDevices(self, search_string):
+        return await self.privatelow.search_devices(search_string)
+
+    # Annotation Calls
+
+    async def get_annotation_by_id(self, annotation_id):
+        return await self.publiclow.get_annotation_by_id(annotation_id)
+
+    async def get_annotation_definitions(self):
+        return await self.publiclow.get_annotation_definition()
+
+    async def get_annotations_by_class(self, annotation_class, from_date, to_date):
+        return await self.publiclow.get_annotations_by_class(annotation_class, from_date, to_date)
+
+    async def get_annotations_by_organisation(self, organisation_id, from_date, to_date):
+        return await self.publiclow.get_annotations_by_organisation(organisation_id, from_date, to_date)
+
+    async def get_animal_annotations(self, animal_id, from_date, to_date):
+        return await self.publiclow.get_animal_annotations(animal_id, from_date, to_date)
+
+    async def insert_animal_annotation(self, animal_id, ts, end_ts, classes, attributes):
+        return await self.publiclow.insert_animal_annotation(animal_id=animal_id, ts=ts, end_ts=end_ts,
+                                                             classes=classes, attributes=attributes)
+
+    async def update_annotation(self, annotation_id, ts=None, end_ts=None, classes=None, attributes=None):
+        return await self.publiclow.update_annotation(annotation_id, ts, end_ts, classes, attributes)
+
+    # Organisation Calls
+
+    async def query_organisations(self, name_search_string=None, partner_id=None):
+        return await self.privatelow.query_organisations(name_search_string, partner_id)
+
+    async def update_organisation_partner(self, organisation_id, partner_id):
+        return await self.privatelow.update_organisation_partner(organisation_id, partner_id)
+
+    # User Calls
+
+    async def get_user_by_id(self, user_id):
+        return await self.privatelow.getUser(user_id)
+
+    async def query_users(self, email_search_string=None):
+        return await self.privatelow.query_users(email_search_string=email_search_string)
+
+    async def get_hidden_shares(self, user_id):
+        return await self.privatelow.get_hidden_shares(user_id)
+
+    async def delete_hidden_share(self, share_id):
+        return await self.privatelow.delete_hidden_share(share_id)
+
+    async def create_hidden_share(self, organisation_id, user_id):
+        return await self.privatelow.create_hidden_share(organisation_id, user_id)
+
+    # Testset Calls
+
+    async def insert_testset(self, name, meta_data, annotation_ids):
+        return await self.publiclow.insert_testset(name, meta_data, annotation_ids)
+
+    async def update_testset(self, testset_id, annotation_ids):
+        return await self.publiclow.update_testset(testset_id, annotation_ids)
+
+    async def get_testset_by_id(self, testset_id):
+        return await self.publiclow.get_testset_by_id(testset_id)
+
+    async def get_testset_by_name(self, name):
+        return await self.publiclow.get_testset_by_name(name)
@@ -0,0 +1,493 @@
+#!/usr/bin/python
+# coding: utf8
+
+import time
+import asyncio
+import logging
+from requests.exceptions import HTTPError
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from . import codec
+from .models import HDict
+from .helper import splitTimeRange
+from .low import BaseAPI, LowLevelInternAPI, PUBLIC_API
+from .bulk import check_sensordata, split_sensordata
+
+
+def encode_params(params):
+    """Turn a requests style params dict into aiohttp query pairs.
+
+    requests drops None values and repeats the key for list values,
+    aiohttp rejects both, so we do the conversion here.
+    """
+    if params is None:
+        return None
+    out = []
+    for k, v in params.items():
+        if v is None:
+            continue
+        if isinstance(v, (list, tuple)):
+            out += [(k, str(x)) for x in v]
+        else:
+            out.append((k, str(v)))
+    return out
+
+
+class AsyncBaseAPI(BaseAPI):
+    def __init__(self, base_url, email=None, password=None, api_key=None, tz_aware=True,
+                 max_concurrency=50):
+        """Initialize a new asyncio base low level API client instance.
+        """
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is needed for the asyncio API client")
+        super(AsyncBaseAPI, self).__init__(base_url, email=email, password=password,
+                                           api_key=api_key, tz_aware=tz_aware)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._login_lock = None
+
+    @property
+    def session(self):
+        raise RuntimeError("use await get_session() with the asyncio API client")
+
+    async def get_session(self):
+        """Geneate a new HTTP session on the fly and login.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(json_serialize=lambda obj: codec.dumps(obj).decode("utf-8"))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._login_lock = asyncio.Lock()
+        # check login
+        async with self._login_lock:
+            if not await self._login():
+                raise ValueError("invalid login information")
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _login(self):
+        """Login to the api with api key or the given credentials.
+        """
+        # check expiration
+        diff = time.time() - self._session_expiration
+        if diff < 0.0:
+            return True
+        # try to use api key
+        if self.api_key:
+            self._session_key = self.api_key
+            self._session_expiration = time.time() + 365 * 24 * 60 * 60
+            return True
+        # login with credentials
+        if self.email is None or self.password is None:
+            raise ValueError("email and password are needed for API access")
+        params = {"email": self.email, "password": self.password}
+        async with self._session.get(self.to_url("/user/get_token"), params=params) as res:
+            if res.status == 200:
+                pass
+            elif res.status == 401 or res.status == 409 or res.status == 422:
+                raise ValueError("invalid login credentials")
+            else:
+                res.raise_for_status()
+            self._session_key = (await res.json())["token"]
+        self._session_expiration = time.time() + 23 * 60 * 60
+        return True
+
+    async def _request(self, method, path, params=None, json=None, timeout=None, version=None,
+                       allow_redirects=True):
+        url = self.to_url(path, version)
+        session = await self.get_session()
+        headers = {"Authorization": "Bearer {}".format(self._session_key)}
+        if timeout is not None:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        async with self._semaphore:
+            start = time.time()
+            async with session.request(method, url, params=encode_params(params), json=json,
+                                       headers=headers, timeout=timeout,
+                                       allow_redirects=allow_redirects) as r:
+                self.track_request(url, r.status, start, method.lower(), path,
+                                   bytes_in=r.content_length or 0)
+                if r.status == 301 and not allow_redirects:
+                    raise HTTPError("301 redirect for {}".format(method))
+                if 400 <= r.status < 500:
+                    res = codec.loads(await r.read())
+                    raise HTTPError("{} Error: {}".format(r.status, res.get("message", "unknown")))
+                if r.status >= 500:
+                    raise HTTPError("{} Server Error: {} for url: {}".format(r.status, r.reason, url))
+                return codec.loads(await r.read())
+
+    async def get(self, path, params=None, timeout=None, version=None):
+        return await self._request("GET", path, params=params, timeout=timeout, version=version)
+
+    async def post(self, path, json=None, params=None, timeout=None, version=None):
+        return await self._request("POST", path, params=params, json=json, timeout=timeout,
+                                   version=version, allow_redirects=False)
+
+    async def put(self, path, json=None, params=None, timeout=None, version=None):
+        return await self._request("PUT", path, params=params, json=json, timeout=timeout,
+                                   version=version, allow_redirects=False)
+
+    async def delete(self, path, params=None, timeout=None, version=None):
+        return await self._request("DELETE", path, params=params, timeout=timeout, version=version)
+
+    async def _paginate(self, path, params, version=None):
+        all_res = []
+        while True:
+            res = await self.get(path, params=params, version=version)
+            all_res += res["data"]
+            if len(res["data"]) < params["limit"]:
+                break
+            else:
+                params["offset"] = res["pagination"]["next_offset"]
+        return all_res
+
+
+class AsyncLowLevelPublicAPI(AsyncBaseAPI):
+    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True,
+                 max_concurrency=50):
+        """Initialize a new asyncio low level API client instance.
+        """
+        ep = endpoint or PUBLIC_API
+        super(AsyncLowLevelPublicAPI, self).__init__(ep, email=email, password=password, api_key=api_key,
+                                                     tz_aware=tz_aware, max_concurrency=max_concurrency)
+        self._timezones = {}
+
+    async def get_status(self):
+        return await self.get("/service/status")
+
+    async def get_organisations(self):
+        if self.api_key:
+            return []
+        return await self.get("/organisation")
+
+    async def get_user(self):
+        if self.api_key:
+            return {"type": "apikey"}
+        u = await self.get("/user")
+        u["type"] = "email"
+        return u
+
+    async def get_organisation_animal_ids(self, organisation_id):
+        params = HDict({"organisation_id": organisation_id})
+        animal_ids = await self.get("/animal/ids_by_organisation", params=params)
+        return [x["_id"] for x in animal_ids]
+
+    async def get_animal_by_id(self, animal_id):
+        params = HDict({"animal_id": animal_id})
+        return await self.get("/animal/by_id", params=params)
+
+    async def get_device_by_id(self, device_id):
+        params = HDict({"device_id": device_id})
+        return await self.get("/device/by_id", params=params)
+
+    async def get_organisation_by_id(self, organisation_id):
+        params = HDict({"organisation_id": organisation_id})
+        return await self.get("/organisation/by_id", params=params)
+
+    async def get_device_sensordata(self, device_id, metric, from_date, to_date):
+        windows = await asyncio.gather(*[self._get_device_sensordata(device_id, metric, f, t)
+                                         for f, t in splitTimeRange(from_date, to_date, 100)])
+        data = []
+        for res in windows:
+            data += res["data"]
+        return data
+
+    async def _get_device_sensordata(self, device_id, metric, from_date, to_date):
+        params = HDict({"device_id": device_id, "metric": metric,
+                        "from_date": from_date, "to_date": to_date})
+        return await self.get("/data/query", params=params)
+
+    async def get_animal_sensordata(self, animal_id, metric, from_date, to_date):
+        windows = await asyncio.gather(*[self._get_animal_sensordata(animal_id, metric, f, t)
+                                         for f, t in splitTimeRange(from_date, to_date, 100)])
+        data = []
+        for res in windows:
+            data += res["data"]
+        return data
+
+    async def _get_animal_sensordata(self, animal_id, metric, from_date, to_date):
+        params = HDict({"animal_id": animal_id, "metric": metric,
+                        "from_date": from_date, "to_date": to_date})
+        return await self.get("/data/query", params=params)
+
+    async def get_animal_events(self, animal_id, from_date=None, to_date=None,
+                                limit=100, offset=0):
+        if from_date:
+            from_date = int(from_date)
+        if to_date:
+            to_date = int(to_date)
+        params = HDict({"animal_id": animal_id, "limit": limit,
+                        "offset": offset, "from_date": from_date,
+                        "to_date": to_date})
+        return await self._paginate("/event/query", params)
+
+    async def get_device_events(self, device_id, from_date=None, to_date=None):
+        if from_date:
+            from_date = int(from_date)
+        if to_date:
+            to_date = int(to_date)
+        params = HDict({"device_id": device_id, "limit": 100, "offset": 0,
+                        "from_date": from_date, "to_date": to_date})
+        return await self._paginate("/event/query", params)
+
+    async def get_events_by_organisation(self, organisation_id, from_date, to_date, categories=None):
+        params = HDict({"organisation_id": organisation_id, "offset": 0, "limit": 100,
+                        "from_date": int(from_date), "to_date": int(to_date),
+                        "categories": categories})
+        return await self._paginate("/event/by_organisation", params)
+
+    async def get_annotation_by_id(self, annotation_id):
+        params = HDict({"annotation_id": annotation_id})
+        return await self.get("/annotation/id", params=params)
+
+    async def get_animal_annotations(self, animal_id, from_date, to_date):
+        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+                        "offset": 0, "animal_id": animal_id})
+        return await self._paginate("/annotation/query", params)
+
+    async def get_annotations_by_class(self, annotation_class, from_date, to_date):
+        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+                        "offset": 0, "annotation_class": annotation_class})
+        return await self._paginate("/annotation/query", params)
+
+    async def get_annotations_by_organisation(self, organisation_id, from_date, to_date):
+        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+                        "offset": 0, "organisation_id": organisation_id})
+        return await self._paginate("/annotation/query", params)
+
+    async def get_annotation_definition(self):
+        return await self.get("/annotation/definition")
+
+    async def insert_animal_annotation(self, animal_id, ts, end_ts, classes=None, attributes=None):
+        p = HDict({"animal_id": animal_id, "ts": ts,
+                   "end_ts": end_ts, "classes": classes,
+                   "attributes": attributes})
+        return await self.put("/annotation/animal", json=p)
+
+    async def update_annotation(self, annotation_id, ts=None, end_ts=None, classes=None, attributes=None):
+        p = HDict({"annotation_id": annotation_id, "ts": ts,
+                   "end_ts": end_ts, "classes": classes,
+                   "attributes": attributes})
+        return await self.post("/annotation/id", json=p)
+
+    async def insert_testset(self, name, meta_data, annotation_ids):
+        p = HDict({"name": name, "meta_data": meta_data, "annotation_ids": annotation_ids})
+        return await self.put("/annotation/testset", json=p, timeout=25)
+
+    async def update_testset(self, testset_id, annotation_ids):
+        p = HDict({"testset_id": testset_id, "annotation_ids": annotation_ids})
+        return await self.post("/annotation/testset", json=p)
+
+    async def get_testset_by_id(self, testset_id):
+        params = HDict({"testset_id": testset_id})
+        return await self.get("/annotation/testset", params=params)
+
+    async def get_testset_by_name(self, name):
+        params = HDict({"name": name})
+        return await self.get("/annotation/testset/by_name", params=params)
+
+    async def get_timezone_for_organisation_id(self, organisation_id):
+        if organisation_id not in self._timezones:
+            res = await self.get_organisation_by_id(organisation_id)
+            self._timezones[organisation_id] = res.get("timezone", None) if res else None
+        return self._timezones[organisation_id]
+
+
+class AsyncLowLevelInternAPI(AsyncBaseAPI):
+    def __init__(self, endpoint, api_key=None, tz_aware=True, max_concurrency=50):
+        """Initialize a new asyncio low level intern API client instance.
+        """
+        if not endpoint:
+            raise ValueError("Endpoint needed for low level API")
+        super(AsyncLowLevelInternAPI, self).__init__(endpoint, api_key=api_key, tz_aware=tz_aware,
+                                                     max_concurrency=max_concurrency)
+
+    async def get_status(self):
+        return await self._api_status()
+
+    async def _api_status(self):
+        return await self.get("/", params={"foo": "bar"})
+
+    async def healthy(self):
+        try:
+            assert(await self._api_status())
+        except Exception as e:
+            logging.error("Status Not Ok: %s", e)
+            return False
+        else:
+            return True
+
+    async def insertSensorData(self, device_id, metric, data):
+        d = [{"device_id": device_id, "metric": metric,
+              "data": list(data)}]
+        return (await self.insertSensorDataBulk(d))[0]
+
+    async def insertSensorDataBulk(self, sensordata, max_points=None, max_bytes=None, timeout=25,
+                                   drop_nan=False):
+        return await self._upload_bulk("put", sensordata, max_points, max_bytes, timeout, drop_nan)
+
+    async def updateSensorData(self, device_id, metric, data):
+        d = [{"device_id": device_id, "metric": metric,
+              "data": list(data)}]
+        return (await self.updateSensorDataBulk(d))[0]
+
+    async def updateSensorDataBulk(self, sensordata, max_points=None, max_bytes=None, timeout=25,
+                                   drop_nan=False):
+        return await self._upload_bulk("post", sensordata, max_points, max_bytes, timeout, drop_nan)
+
+    async def _upload_bulk(self, method, sensordata, max_points, max_bytes, timeout, drop_nan):
+        """Upload the chunks of a bulk payload concurrently (see
+        LowLevelInternAPI.uploadSensorDataBulk).
+        """
+        sensordata = check_sensordata(sensordata, drop_nan=drop_nan)
+        chunks = split_sensordata(sensordata, max_points or LowLevelInternAPI.BULK_MAX_POINTS,
+                                  max_bytes or LowLevelInternAPI.BULK_MAX_BYTES)
+        send = self.post if method == "post" else self.put
+        results = await asyncio.gather(*[send("/sensordatabulk", json=HDict({"sensordata": c}), timeout=timeout)
+                                         for c in chunks])
+        return LowLevelInternAPI._bulk_result_list(results)
+
+    async def getSensorData(self, device_id, metric, from_date, to_date):
+        return (await self.getSensorDataBulk(device_id, [metric], from_date, to_date))[0]
+
+    async def getSensorDataRange(self, device_id, metric):
+        params = HDict({"device_id": device_id, "metric": metric})
+        return await self.get("/sensordatarange", params=params)
+
+    async def getSensorDataBulk(self, device_id, metrics, from_date, to_date):
+        params = HDict({"device_id": device_id, "metrics": list(metrics),
+                        "from_date": from_date, "to_date": to_date})
+        return await self.get("/sensordatabulk", params=params, timeout=15)
+
+    async def getLastSensorData(self, device_id, metric):
+        return (await self.getLastSensorDataBulk(device_id, [metric]))[0]
+
+    async def getLastSensorDataBulk(self, device_id, metrics):
+        params = HDict({"device_id": device_id, "metrics": list(metrics)})
+        return await self.get("/lastsensordata", params=params)
+
+    async def insertEvent(self, device_id, event_type, timestamp, value,
+                          metadata, level=10, disable_notifications=False):
+        hooks = 1 if disable_notifications else 0
+        metadata["value"] = value
+        p = HDict({"device_id": device_id, "metadata": dict(metadata),
+                   "event_type": event_type, "level": level,
+                   "timestamp": timestamp, "disable_hooks": hooks})
+        return await self.put("/event", json=p)
+
+    async def updateEventMeta(self, device_id, _id, event_meta):
+        p = HDict({"event_id": _id, "metadata": event_meta})
+        return await self.post("/event", json=p)
+
+    async def getLastEventTimestamps(self, device_id):
+        p = HDict({"device_id": device_id})
+        return await self.get("/lasteventtimestamps", params=p)
+
+    async def setDeviceMeta(self, device_id, metadata):
+        p = HDict({"device_id": device_id, "metadata": dict(metadata),
+                   "namespace": "anthill"})
+        return await self.post("/devicemetadata", json=p)
+
+    async def getSensorInfo(self, device_id):
+        p = HDict({"device_id": device_id})
+        return await self.get("/sensorinfo", params=p)
+
+    async def deleteEvent(self, event_id):
+        p = HDict({"event_id": event_id})
+        return await self.delete("/event", params=p)
+
+    async def getDevice(self, device_id, with_animal=True, with_organisation=True,
+                        with_allmeta=True):
+        data = HDict({"device_id": device_id,
+                      "with_animal": 1 if with_animal else 0,
+                      "with_organisation": 1 if with_organisation else 0,
+                      "with_allmeta": 1 if with_allmeta else 0})
+        return await self.get("/device", params=data)
+
+    async def getOrganisation(self, organisation_id):
+        p = HDict({"organisation_id": organisation_id})
+        return await self.get("/organisation/by_id", params=p, version="v1")
+
+    async def getUser(self, user_id):
+        p = HDict({"user_id": user_id})
+        return await self.get("/user/by_id", params=p, version="v1")
+
+    async def query_organisations(self, name_search_string=None, partner_id=None):
+        params = HDict({"name_search_string": name_search_string, "limit": 100,
+                        "offset": 0, "partner_id": partner_id})
+        return await self._paginate("/organisation/list", params, version="v1")
+
+    async def getOrganisationList(self):
+        return await self.get("/organisationlist")
+
+    async def getAnimal(self, animal_id):
+        p = HDict({"animal_id": animal_id})
+        return await self.get("/animal", params=p)
+
+    async def update_organisation_partner(self, organisation_id, partner_id):
+        p = HDict({"organisation_id": organisation_id,
+                   "partner_id": partner_id})
+        return await self.post("/organisation/partner_id", json=p, version="v1")
+
+    async def get_devices_seen(self, device_id, hours_back=24, return_sum=True, to_ts=None):
+        p = HDict({"device_id": device_id, "hours_back": int(hours_back)})
+        p["return_sum"] = 1 if return_sum else 0
+        if to_ts:
+            p["to_ts"] = int(to_ts)
+        return await self.get("/devicesonline", params=p)
+
+    async def getNodeInfos(self, device_id, from_date, to_date):
+        p = HDict({"device_id": device_id, "from_date": int(from_date), "to_date": int(to_date)})
+        return await self.get("/nodeinfobulk", params=p)
+
+    async def getUploads(self, device_id, from_date, to_date):
+        p = HDict({"device_id": device_id, "from_date": int(from_date), "to_date": int(to_date)})
+        return await self.get("/anthilluploadbulk", params=p)
+
+    async def lastProductionDevices(self, device_id=None, skip=0, limit=10):
+        p = HDict({"skip": int(skip), "limit": int(limit)})
+        if device_id:
+            p["device_id"] = device_id
+        return await self.get("/productionevents", params=p)
+
+    async def query_users(self, email_search_string=None):
+        params = HDict({"email_search_string": email_search_string, "limit": 100,
+                        "offset": 0})
+        return await self._paginate("/user/list", params, version="v1")
+
+    async def get_hidden_shares(self, user_id):
+        params = HDict({"user_id": user_id})
+        return await self.get("/user/hidden_shares_by_user", params=params, version="v1")
+
+    async def delete_hidden_share(self, share_id):
+        params = HDict({"share_id": share_id})
+        return await self.delete("/user/hidden_share", params=params, version="v1")
+
+    async def create_hidden_share(self, organisation_id, user_id):
+        params = HDict({"organisation_id": organisation_id,
+                        "user_id": user_id})
+        return await self.put("/user/hidden_share", json=params, version="v1")
+
+    async def search_devices(self, search_string):
+        p = HDict({"search_string": search_string})
+        return await self.get("/devicesearch", params=p)
+
+    async def get_device_uploads(self, from_ts, to_ts, device_id):
+        params = HDict({"device_id": device_id, "from_date": from_ts, "to_date": to_ts})
+        return await self.get("/anthilluploadbulk", params=params)
+
+    async def get_animals_by_organisation(self, organisation_id):
+        p = HDict({"organisation_id": organisation_id})
+        return await self.get("/animallist", params=p)
@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# coding: utf8
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+from requests.exceptions import HTTPError
+
+from . import codec
+
+
+class BulkChunk(object):
+    def __init__(self, index, sensordata):
+        """One request of a chunked bulk upload.
+
+        result is the decoded response, error the exception of the last
+        failed attempt (None once the chunk is uploaded).
+        """
+        self.index = index
+        self.sensordata = sensordata
+        self.points = sum(len(s["data"]) for s in sensordata)
+        self.result = None
+        self.error = None
+        self.attempts = 0
+
+    @property
+    def ok(self):
+        return self.attempts > 0 and self.error is None
+
+    def __repr__(self):
+        return "<{}({}, points={}, attempts={}, ok={})>".format(
+            self.__class__.__name__, self.index, self.points, self.attempts, self.ok)
+
+
+class BulkUploadError(HTTPError):
+    def __init__(self, chunks):
+        """Some chunks of a bulk upload failed.
+
+        An HTTPError, so existing handlers keep working; response is the
+        one of the first failed chunk (if any).
+        """
+        self.chunks = chunks
+        self.failed = [c for c in chunks if c.error is not None]
+        first = self.failed[0].error if self.failed else None
+        super(BulkUploadError, self).__init__(
+            "{} of {} chunks failed: {}".format(len(self.failed), len(chunks), first),
+            response=getattr(first, "response", None))
+
+
+class Points(object):
+    def __init__(self, ts, values):
+        """Points of one series as int64 timestamps and float64 values.
+
+        The codec embeds to_json(), which writes [[ts, value], ...] from
+        the two columns, so timestamps stay integers on the wire.
+        """
+        self.ts = ts
+        self.values = values
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Points(self.ts[key], self.values[key])
+        return [int(self.ts[key]), float(self.values[key])]
+
+    def tolist(self):
+        return [list(p) for p in zip(self.ts.tolist(), self.values.tolist())]
+
+    def to_json(self):
+        if not len(self.ts):
+            return b"[]"
+        if codec.NAME == "orjson" and np.abs(self.ts).max() < 2 ** 53:
+            # orjson writes the stacked floats natively; timestamps are the only
+            # numbers followed by "," and are exact, so "1480773600.0," -> "1480773600,"
+            stacked = np.column_stack((self.ts.astype(np.float64), self.values))
+            return codec.dumps(stacked).replace(b".0,", b",")
+        # "[1,2]" and "[0.5,1.5]" become "[1", "[2" and "0.5]", "1.5]", which
+        # are interleaved and joined by "," without per point objects
+        ts = b"[" + codec.dumps(self.ts)[1:-1].replace(b",", b",[")
+        values = codec.dumps(self.values)[1:-1].replace(b",", b"],") + b"]"
+        parts = [None] * (2 * len(self.ts))
+        parts[0::2] = ts.split(b",")
+        parts[1::2] = values.split(b",")
+        return b"[" + b",".join(parts) + b"]"
+
+
+def is_array(data):
+    return np is not None and isinstance(data, np.ndarray)
+
+
+def is_points(data):
+    return isinstance(data, Points)
+
+
+def _check_points(data, metric):
+    for point in data:
+        if not isinstance(point[0], (int, float)):
+            raise ValueError("Invalid TS Point: %s of metric %s",
+                             (point, metric))
+        if not isinstance(point[1], (int, float)):
+            raise ValueError("Invalid VALUE Point: %s of metric %s",
+                             (point, metric))
+        if not (math.isfinite(point[0]) and math.isfinite(point[1])):
+            raise ValueError("NaN/inf in Point: %s of metric %s", (point, metric))
+
+
+def _finite(points, metric, drop_nan):
+    mask = np.isfinite(points).all(axis=1) if points.ndim == 2 else np.isfinite(points)
+    if mask.all():
+        return None
+    if not drop_nan:
+        raise ValueError("{} NaN/inf points in metric {}".format(len(mask) - mask.sum(), metric))
+    return mask
+
+
+def _columns(ts, values, metric, drop_nan):
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if ts.dtype.kind == "f":
+        mask = _finite(np.column_stack((ts, values)), metric, drop_nan)
+    else:
+        mask = _finite(values, metric, drop_nan)
+    if mask is not None:
+        ts, values = ts[mask], values[mask]
+    return Points(np.ascontiguousarray(ts, dtype=np.int64), values)
+
+
+def to_points(data, metric=None, drop_nan=False):
+    """Validate the points of one series.
+
+    data is a list of (timestamp, value) pairs, a (timestamps, values)
+    tuple of arrays, a (n, 2) array or a pandas Series (indexed by
+    timestamps or datetimes). Arrays and series are returned as Points
+    (int64 timestamps, float64 values). NaN/inf points raise a
+    ValueError or are dropped with drop_nan.
+    """
+    if pd is not None and isinstance(data, pd.Series):
+        index = data.index
+        if isinstance(index, pd.DatetimeIndex):
+            ts = index.values.astype("datetime64[s]").astype(np.int64)
+        else:
+            ts = np.asarray(index)
+        data = (ts, data.values)
+    if isinstance(data, tuple) and len(data) == 2 and is_array(data[0]):
+        ts, values = np.asarray(data[0]), np.asarray(data[1])
+        if ts.shape != values.shape or ts.ndim != 1:
+            raise ValueError("timestamps and values of metric {} differ in shape".format(metric))
+        if ts.dtype.kind not in "biuf" or values.dtype.kind not in "biuf":
+            raise ValueError("Invalid points of metric {}: {}/{} arrays".format(metric, ts.dtype, values.dtype))
+        return _columns(ts, values, metric, drop_nan)
+    if is_array(data):
+        if data.ndim != 2 or data.shape[1] != 2 or data.dtype.kind not in "biuf":
+            raise ValueError("Invalid points of metric {}: {} array of shape {}".format(
+                metric, data.dtype, data.shape))
+        return _columns(data[:, 0], data[:, 1], metric, drop_nan)
+
+    if not isinstance(data, list):
+        data = list(data)
+    if np is None:
+        _check_points(data, metric)
+        return data
+    points = np.asarray(data) if data else np.empty((0, 2))
+    if points.ndim != 2 or points.shape[1] != 2 or points.dtype.kind not in "biuf":
+        # find the offending point
+        _check_points(data, metric)
+        raise ValueError("Invalid points of metric {}".format(metric))
+    mask = _finite(points, metric, drop_nan)
+    if mask is None:
+        return data
+    return [p for p, ok in zip(data, mask) if ok]
+
+
+def check_sensordata(sensordata, drop_nan=False):
+    """Validated copy of a bulk payload, see to_points.
+    """
+    out = []
+    for s in sensordata:
+        s = dict(s)
+        s["data"] = to_points(s["data"], s.get("metric"), drop_nan)
+        out.append(s)
+    return out
+
+
+def has_arrays(sensordata):
+    return any(is_points(s["data"]) for s in sensordata)
+
+
+def point_size(data, sample=100):
+    """Estimated JSON size of one point of data in bytes.
+    """
+    sample = data[:sample]
+    if not len(sample):
+        return 1.0
+    if not is_points(sample):
+        sample = list(sample)
+    return max(1.0, len(codec.dumps(sample)) / float(len(sample)))
+
+
+def split_sensordata(sensordata, max_points=None, max_bytes=None):
+    """Split a bulk payload into chunks of at most max_points points and
+    about max_bytes bytes of JSON.
+
+    Series which do not fit are split into several parts with the same
+    device_id and metric. At least one (maybe empty) chunk is returned.
+    """
+    chunks = []
+    chunk = []
+    points = 0
+    size = 0.0
+    for s in sensordata:
+        data = s["data"]
+        if not isinstance(data, (list, tuple)) and not is_points(data):
+            data = list(data)
+        psize = point_size(data) if max_bytes else 0
+        start = 0
+        while True:
+            n = len(data) - start
+            if max_points:
+                n = min(n, max_points - points)
+            if max_bytes:
+                n = min(n, int((max_bytes - size) // psize))
+            if n <= 0 and start < len(data):
+                if chunk:
+                    chunks.append(chunk)
+                    chunk, points, size = [], 0, 0.0
+                    continue
+                # a single point larger than max_bytes
+                n = 1
+            n = max(n, 0)
+            part = dict(s)
+            part["data"] = data[start:start + n]
+            chunk.append(part)
+            points += n
+            size += n * psize
+            start += n
+            if start >= len(data):
+                break
+    if chunk or not chunks:
+        chunks.append(chunk)
+    return chunks
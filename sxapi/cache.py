@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# coding: utf8
+
+import os
+import json
+import time
+import hashlib
+import threading
+import collections
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+
+class CacheEntry(object):
+    def __init__(self, body, etag=None, last_modified=None, stored_at=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at or time.time()
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    def __init__(self, max_size=32 * 1024 * 1024, ttl=24 * 60 * 60, directory=None,
+                 max_disk_size=256 * 1024 * 1024):
+        """Cache for response bodies and their validators (ETag, Last-Modified).
+
+        Entries are kept in memory up to max_size bytes (least recently used
+        are evicted first) and dropped ttl seconds after they were stored.
+        With a directory entries are also written to disk, bounded by
+        max_disk_size bytes, so they survive restarts.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        items = sorted((k, v) for k, v in params.items() if v is not None)
+        return "{}?{}".format(url, urlencode(items, doseq=True))
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry.stored_at > self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry):
+                    self._drop(key)
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            if entry is None and self.directory is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._store(key, entry)
+            if self.directory is not None:
+                self._save(key, entry)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                self._drop(k)
+                if self.directory is not None:
+                    for f in self._paths(k):
+                        if os.path.exists(f):
+                            os.remove(f)
+
+    def _store(self, key, entry):
+        self._drop(key)
+        if entry.size > self.max_size:
+            return
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    # disk layer
+
+    def _paths(self, key):
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + ".json", base + ".body"
+
+    def _load(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (IOError, OSError, ValueError):
+            return None
+        entry = CacheEntry(body, meta.get("etag"), meta.get("last_modified"), meta.get("stored_at"))
+        if meta.get("key") != key or self._expired(entry):
+            return None
+        return entry
+
+    def _save(self, key, entry):
+        meta_path, body_path = self._paths(key)
+        with open(body_path, "wb") as f:
+            f.write(entry.body)
+        with open(meta_path, "w") as f:
+            json.dump({"key": key, "etag": entry.etag, "last_modified": entry.last_modified,
+                       "stored_at": entry.stored_at}, f)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".body"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_size:
+                break
+            os.remove(path)
+            meta_path = path[:-len(".body")] + ".json"
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            total -= size
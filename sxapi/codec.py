@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# coding: utf8
+
+import json
+import gzip
+import uuid
+import functools
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+if orjson is not None:
+    NAME = "orjson"
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj, default):
+        return orjson.dumps(obj, default=default, option=orjson.OPT_SERIALIZE_NUMPY)
+elif ujson is not None:
+    NAME = "ujson"
+
+    def loads(data):
+        return ujson.loads(data)
+
+    def _dumps(obj, default):
+        return ujson.dumps(obj, default=default).encode("utf-8")
+else:
+    NAME = "json"
+
+    def loads(data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    def _dumps(obj, default):
+        return json.dumps(obj, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def dumps(obj):
+    """JSON encode obj to bytes.
+
+    Objects with a to_json() method (e.g. bulk.Points) are embedded as the
+    raw JSON it returns, numpy arrays and scalars are supported.
+    """
+    fragments = _Fragments()
+    body = _dumps(obj, functools.partial(_default, fragments))
+    for token, raw in fragments.items:
+        body = body.replace(token, raw, 1)
+    return body
+
+
+class _Fragments(object):
+    # raw JSON to put in place of unique string tokens after encoding
+    def __init__(self):
+        self.prefix = None
+        self.items = []
+
+    def add(self, raw):
+        if self.prefix is None:
+            self.prefix = uuid.uuid4().hex
+        token = "__fragment_{}_{}__".format(self.prefix, len(self.items))
+        self.items.append(('"{}"'.format(token).encode("utf-8"), raw))
+        return token
+
+
+def _default(fragments, obj):
+    if hasattr(obj, "to_json"):
+        return fragments.add(obj.to_json())
+    # numpy arrays and scalars
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(obj).__name__))
+
+
+def compress(body, level=6):
+    return gzip.compress(body, compresslevel=level)
@@ -1,12 +1,26 @@
 #!/usr/bin/python
 # coding: utf8
 
+import copy
 import datetime
 import collections
 import pendulum
 import time
+import threading
 import functools
-import pendulum
+
+try:
+    from collections.abc import Hashable
+except ImportError:
+    from collections import Hashable
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
 
 def toTS(dt):
@@ -46,12 +60,77 @@ def fromTS(ts, timezone=None, tz_aware=True):
     )
 
 
+_TIMEZONES = {}
+_TZ_OFFSETS = {}
+
+
+def get_timezone(name):
+    """Cached timezone object (for pandas) of a timezone name.
+    """
+    tz = _TIMEZONES.get(name)
+    if tz is None:
+        tz = _TIMEZONES[name] = pd.Timestamp("1970-01-01", tz=name).tz
+    return tz
+
+
+def _offset_1970(tz):
+    # toTS counts from 1970-01-01 00:00 in the timezone of the datetime
+    key = str(tz)
+    offset = _TZ_OFFSETS.get(key)
+    if offset is None:
+        offset = _TZ_OFFSETS[key] = int(pd.Timestamp("1970-01-01", tz=tz).utcoffset().total_seconds())
+    return offset
+
+
+def localize_array(wall, timezone=None):
+    """Localize naive datetime64 wall clock times like fromTS does (the
+    hour skipped by DST is shifted forward, repeated hours are standard
+    time). Returns a timezone aware DatetimeIndex.
+    """
+    index = pd.DatetimeIndex(wall)
+    return index.tz_localize(get_timezone(timezone or "UTC"), ambiguous=np.zeros(len(index), dtype=bool),
+                             nonexistent=pd.Timedelta(hours=1))
+
+
+def fromTS_array(ts, timezone=None, tz_aware=True):
+    """Vectorized fromTS for an array of timestamps.
+
+    Returns a DatetimeIndex in timezone or, with tz_aware=False, naive
+    datetime64[s] values.
+    """
+    wall = np.asarray(ts).astype(np.int64).astype("datetime64[s]")
+    if not tz_aware:
+        return wall
+    return localize_array(wall, timezone)
+
+
+def toTS_array(values):
+    """Vectorized toTS, returns an int64 array.
+
+    values is a (timezone aware) DatetimeIndex, a datetime64 array or a
+    sequence of numbers or datetimes.
+    """
+    if pd is not None and isinstance(values, pd.Series):
+        values = values.values if values.dt.tz is None else pd.DatetimeIndex(values)
+    if pd is not None and isinstance(values, pd.DatetimeIndex):
+        if values.tz is None:
+            return values.values.astype("datetime64[s]").astype(np.int64)
+        utc = values.tz_convert(None).values.astype("datetime64[s]").astype(np.int64)
+        return utc + _offset_1970(values.tz)
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[s]").astype(np.int64)
+    if values.dtype.kind == "O":
+        return np.array([toTS(x) for x in values], dtype=np.int64)
+    return values.astype(np.int64)
+
+
 def splitDateRange(start, end, days):
     assert start <= end
     f = toTS(start)
     t = toTS(end)
     diff = days * 24 * 60 * 60
-    last = f
+    last = f - 1
     # left = end - start
     for i in range(f, t - diff, diff):
         last = i+diff-1
@@ -65,7 +144,7 @@ def splitTimeRange(start, end, days):
     f = int(start)
     t = int(end)
     diff = days * 24 * 60 * 60
-    last = f
+    last = f - 1
     # left = end - start
     for i in range(f, t - diff, diff):
         last = i+diff-1
@@ -84,7 +163,7 @@ class Memoize(object):
         self.cache = {}
 
     def __call__(self, *args):
-        if not isinstance(args, collections.Hashable):
+        if not isinstance(args, Hashable):
             # uncacheable. a list, for instance.
             # better to not cache than blow up.
             return self.func(*args)
@@ -102,3 +181,174 @@ class Memoize(object):
     def __get__(self, obj, objtype):
         '''Support instance methods.'''
         return functools.partial(self.__call__, obj)
+
+
+class LRUCache(object):
+    """Thread safe LRU cache with optional time to live (seconds).
+    """
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires is None or expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+_MISSING = object()
+
+
+def _cache_key(args, kwargs):
+    key = (args, frozenset(kwargs.items())) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class cached(object):
+    """Decorator. Caches the return values of a method per instance.
+
+    At most maxsize results are kept, each for ttl seconds (None: forever).
+    Every instance gets its own cache, the bound method offers
+    invalidate(*args, **kwargs), cache_clear() and cache_info().
+    Calls with unhashable arguments are not cached.
+
+    enabled(instance) decides per call whether the cache is used. With
+    copy_result every caller gets a deep copy, so mutating a result does
+    not change the cached value.
+    """
+    def __init__(self, maxsize=128, ttl=None, enabled=None, copy_result=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.copy_result = copy_result
+
+    def __call__(self, func):
+        return CachedMethod(func, self.maxsize, self.ttl, self.enabled, self.copy_result)
+
+
+class CachedMethod(object):
+    def __init__(self, func, maxsize, ttl, enabled=None, copy_result=False):
+        self.func = func
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.copy_result = copy_result
+        self.attr = "_cache_{}".format(func.__name__)
+        functools.update_wrapper(self, func)
+
+    def cache_for(self, obj):
+        cache = obj.__dict__.get(self.attr)
+        if cache is None:
+            cache = obj.__dict__.setdefault(self.attr, LRUCache(self.maxsize, self.ttl))
+        return cache
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return BoundCachedMethod(self, obj)
+
+
+class BoundCachedMethod(object):
+    def __init__(self, method, obj):
+        self.method = method
+        self.obj = obj
+        self.__doc__ = method.func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        method = self.method
+        key = _cache_key(args, kwargs)
+        if key is None or (method.enabled is not None and not method.enabled(self.obj)):
+            return method.func(self.obj, *args, **kwargs)
+        cache = method.cache_for(self.obj)
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = method.func(self.obj, *args, **kwargs)
+            cache.set(key, value)
+        return copy.deepcopy(value) if method.copy_result else value
+
+    def invalidate(self, *args, **kwargs):
+        self.method.cache_for(self.obj).invalidate(_cache_key(args, kwargs))
+
+    def cache_clear(self):
+        self.method.cache_for(self.obj).invalidate()
+
+    def cache_info(self):
+        return self.method.cache_for(self.obj).stats()
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Runs func only once for concurrent calls with the same key.
+
+    Callers arriving while a call is in flight wait for it and get the same
+    result (or exception).
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
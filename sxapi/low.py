@@ -6,33 +6,61 @@ import time
 import logging
 import requests
 import re
-from requests.exceptions import HTTPError
+import threading
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import HTTPError, ConnectionError, Timeout
 
+from . import codec
 from .models import HDict
-from .helper import splitTimeRange, Memoize
+from .helper import splitTimeRange, cached, SingleFlight
+from .pagination import Paginator
+from .stream import iter_json_array, collect_arrays
+from .metrics import Metrics, Req
+from .cache import CacheEntry
+from .bulk import BulkChunk, BulkUploadError, check_sensordata, split_sensordata, has_arrays
 
 
 PUBLIC_API = "https://api.smaxtec.com/api/v1"
 
 
-class Req(object):
-    def __init__(self, url, status, start, end=None):
-        self.url = url
-        self.start = start
-        self.status = status
-        if end is None:
-            self.end = time.time()
-        else:
-            self.end = end
-
-    @property
-    def timer(self):
-        return self.end - self.start
+def lookup_cache_enabled(api):
+    return api.cache_lookups and api.cache is None
 
 
 class BaseAPI(object):
-    def __init__(self, base_url, email=None, password=None, api_key=None, tz_aware=True):
+    HOOK_EVENTS = ("before_request", "after_response", "error")
+    # responses up to this Content-Length are decoded at once, see get_json_array
+    STREAM_MIN_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, base_url, email=None, password=None, api_key=None, tz_aware=True,
+                 max_workers=1, retry=None, rate_limiter=None, pool_connections=10,
+                 pool_maxsize=None, keep_alive=True, compress_requests=False, compress_min_size=16 * 1024,
+                 cache=None, coalesce=True, cache_lookups=False):
         """Initialize a new base low level API client instance.
+
+        max_workers is the default number of requests in flight for calls
+        which are split into several requests (e.g. long sensordata ranges).
+        retry is an optional RetryPolicy, rate_limiter an optional (shared)
+        RateLimiter.
+
+        One instance can be shared between threads. Login and request
+        tracking are lock protected and the connection pool keeps up to
+        pool_maxsize connections per host (default: max(10, max_workers)).
+
+        Responses are decoded with the fastest JSON codec installed (see
+        codec). With compress_requests JSON bodies of at least
+        compress_min_size bytes are sent gzip compressed.
+
+        cache is an optional ResponseCache used for conditional GET requests
+        of entity lookups (see cached_get).
+
+        With coalesce identical GET requests running at the same time in
+        several threads are sent only once and share the decoded result.
+
+        With cache_lookups device and organisation lookups are kept in
+        memory for up to five minutes. This is ignored when a cache is
+        set, which revalidates every lookup instead.
         """
         self.api_base_url = base_url.rstrip("/")
         self.email = email
@@ -42,26 +70,83 @@ class BaseAPI(object):
         self._session_key = None
         self._session_expiration = time.time() - 1
         self._session = None
-        self.counter = 0
-        self.requests = []
+        self.metrics = Metrics()
         self.tz_aware = tz_aware
+        self.max_workers = max_workers
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize or max(10, max_workers)
+        self.keep_alive = keep_alive
+        self.compress_requests = compress_requests
+        self.compress_min_size = compress_min_size
+        self.cache = cache
+        self.coalesce = coalesce
+        self.cache_lookups = cache_lookups
+        self._inflight = SingleFlight()
+        self._lock = threading.RLock()
+        self.hooks = dict((e, []) for e in self.HOOK_EVENTS)
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
 
     @property
     def session(self):
         """Geneate a new HTTP session on the fly and login.
         """
         if not self._session:
-            self._session = requests.Session()
+            with self._lock:
+                if not self._session:
+                    self._session = self._create_session()
         # check login
         if not self._login():
             raise ValueError("invalid login information")
         return self._session
 
-    def track_request(self, url, status, start):
-        self.counter += 1
-        self.requests.append(Req(url, status, start))
-        if len(self.requests) > 100:
-            self.requests.pop(0)
+    def add_hook(self, event, func):
+        """Register func(info) for a request lifecycle event.
+
+        before_request is called once per request, after_response once the
+        body is decoded and error if the request fails. info is a dict with
+        method, path, url, params_size, request_size, attempts, status,
+        elapsed (network time of the last attempt), response_size,
+        decode_time and error.
+        """
+        if event not in self.hooks:
+            raise ValueError("unknown hook event: {}".format(event))
+        self.hooks[event].append(func)
+
+    def remove_hook(self, event, func):
+        self.hooks[event].remove(func)
+
+    def fire_hook(self, event, info):
+        for func in self.hooks[event]:
+            try:
+                func(info)
+            except Exception:
+                logging.exception("%s hook failed", event)
+
+    def track_request(self, url, status, start, method="get", path=None, bytes_in=0, bytes_out=0):
+        self.metrics.record(method, path or url, url, status, start,
+                            bytes_in=bytes_in, bytes_out=bytes_out)
+
+    @property
+    def counter(self):
+        return self.metrics.counter
+
+    @property
+    def retry_counter(self):
+        return self.metrics.retries
+
+    @property
+    def requests(self):
+        return list(self.metrics.recent)
 
     def stats(self):
         out = []
@@ -70,6 +155,20 @@ class BaseAPI(object):
             out.append("{} in {} seconds".format(r.url, r.timer))
         return out
 
+    def map_concurrent(self, func, items, max_workers=None):
+        """Call func(*item) for all items with up to max_workers threads.
+        Results are returned in the order of items.
+        """
+        if max_workers is None:
+            max_workers = self.max_workers
+        items = list(items)
+        if max_workers <= 1 or len(items) <= 1:
+            return [func(*x) for x in items]
+        # login once before the workers start
+        self.session
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(lambda x: func(*x), items))
+
     def to_url(self, path, version_modifier=None):
         url = "{}{}".format(self.api_base_url, path)
         if version_modifier is not None:
@@ -80,9 +179,15 @@ class BaseAPI(object):
         """Login to the api with api key or the given credentials.
         """
         # check expiration
-        diff = time.time() - self._session_expiration
-        if diff < 0.0:
+        if time.time() - self._session_expiration < 0.0:
             return True
+        with self._lock:
+            # another thread may have logged in while we were waiting
+            if time.time() - self._session_expiration < 0.0:
+                return True
+            return self._do_login()
+
+    def _do_login(self):
         # try to use api key
         if self.api_key:
             self._session_key = self.api_key
@@ -105,61 +210,229 @@ class BaseAPI(object):
         self._session_expiration = time.time() + 23 * 60 * 60
         return True
 
-    def get(self, path, *args, **kwargs):
+    def _send(self, method, path, *args, **kwargs):
+        """Send a request and return the checked response and the hook info.
+        """
         version = kwargs.pop("version", None)
         url = self.to_url(path, version)
+        if method in ("post", "put"):
+            kwargs["allow_redirects"] = False
+        if self.compress_requests and "json" in kwargs:
+            self._encode_body(kwargs)
+        info = {"method": method, "path": path, "url": url,
+                "params_size": len(kwargs.get("params") or ()),
+                "request_size": len(kwargs.get("data") or b""),
+                "attempts": 0, "status": None, "elapsed": None, "response_size": None,
+                "decode_time": None}
+        self.fire_hook("before_request", info)
+        try:
+            r = self._send_with_retry(method, path, url, info, *args, **kwargs)
+            if r.status_code == 301 and method in ("post", "put"):
+                raise HTTPError("301 redirect for {}".format(method.upper()))
+            if 400 <= r.status_code < 500:
+                raise HTTPError("{} Error: {}".format(r.status_code, self.decode(r).get("message", "unknown")))
+            r.raise_for_status()
+        except Exception as e:
+            info["error"] = e
+            self.fire_hook("error", info)
+            raise
+        return r, info
+
+    def _send_with_retry(self, method, path, url, info, *args, **kwargs):
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.time()
+            info["attempts"] = attempt + 1
+            try:
+                r = getattr(self.session, method)(url, *args, **kwargs)
+            except (ConnectionError, Timeout):
+                info["elapsed"] = time.time() - start
+                self.track_request(url, None, start, method, path)
+                if self.retry is None or not self.retry.can_retry(method, attempt):
+                    raise
+                wait = self.retry.backoff(attempt)
+            else:
+                info["elapsed"] = time.time() - start
+                info["status"] = r.status_code
+                info["response_size"] = self._response_size(r, kwargs.get("stream", False))
+                self.track_request(url, r.status_code, start, method, path,
+                                   bytes_in=info["response_size"],
+                                   bytes_out=self._request_size(r))
+                if self.retry is None or not self.retry.should_retry(method, r.status_code, attempt):
+                    return r
+                wait = self.retry.backoff(attempt, r.headers.get("Retry-After"))
+                # hand the connection back to the pool before the next attempt
+                r.close()
+            logging.warning("retry %s %s in %.2f seconds", method.upper(), url, wait)
+            self.metrics.record_retry(method, path)
+            attempt += 1
+            time.sleep(wait)
+
+    @staticmethod
+    def _response_size(r, stream=False):
+        length = r.headers.get("Content-Length")
+        if length is not None:
+            return int(length)
+        if stream:
+            return 0
+        return len(r.content)
+
+    @staticmethod
+    def _request_size(r):
+        body = getattr(getattr(r, "request", None), "body", None)
+        if isinstance(body, (bytes, str)):
+            return len(body)
+        return 0
+
+    def _encode_body(self, kwargs, compress=True):
+        body = codec.dumps(kwargs.pop("json"))
+        headers = dict(kwargs.get("headers") or {})
+        headers["Content-Type"] = "application/json"
+        if compress and len(body) >= self.compress_min_size:
+            body = codec.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        kwargs["data"] = body
+        kwargs["headers"] = headers
+
+    def decode(self, r):
+        return codec.loads(r.content)
+
+    def _finish(self, info, content):
         start = time.time()
-        r = self.session.get(url, *args, **kwargs)
-        self.track_request(url, r.status_code, start)
-        if 400 <= r.status_code < 500:
-            raise HTTPError("{} Error: {}".format(r.status_code, r.json().get("message", "unknown")))
-        r.raise_for_status()
-        return r.json()
+        data = codec.loads(content)
+        info["decode_time"] = time.time() - start
+        self.fire_hook("after_response", info)
+        return data
 
-    def post(self, path, *args, **kwargs):
-        version = kwargs.pop("version", None)
-        url = self.to_url(path, version)
+    def _request(self, method, path, *args, **kwargs):
+        r, info = self._send(method, path, *args, **kwargs)
+        return self._finish(info, r.content)
+
+    def _flight_key(self, name, path, kwargs):
+        """Key for coalescing a GET, None if it must be sent on its own.
+        """
+        if not self.coalesce or set(kwargs) - set(("params", "version")):
+            return None
+        key = (name, path, kwargs.get("version"), kwargs.get("params"))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def cached_get(self, path, params=None, **kwargs):
+        """GET with If-None-Match/If-Modified-Since validation against the cache.
+
+        A 304 response is answered from the cached body. Without a cache
+        this is a plain get.
+        """
+        if self.cache is None:
+            return self.get(path, params=params, **kwargs)
+        kwargs["params"] = params
+        key = self._flight_key("cached_get", path, kwargs)
+        if key is None:
+            return self._cached_get(path, **kwargs)
+        return self._inflight.do(key, lambda: self._cached_get(path, **kwargs))
+
+    def _cached_get(self, path, params=None, **kwargs):
+        key = self.cache.key(self.to_url(path, kwargs.get("version")), params)
+        entry = self.cache.get(key)
+        if entry is not None:
+            headers = dict(kwargs.pop("headers", None) or {})
+            headers.update(entry.validators())
+            kwargs["headers"] = headers
+        r, info = self._send("get", path, params=params, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            return self._finish(info, entry.body)
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.cache.set(key, CacheEntry(r.content, etag, last_modified))
+        return self._finish(info, r.content)
+
+    def iter_json(self, path, key=None, *args, **kwargs):
+        """GET a JSON array (or the array under key) element by element.
+
+        The response body is streamed and decoded incrementally, see
+        stream.JSONArrayStream.
+        """
+        kwargs["stream"] = True
+        r, info = self._send("get", path, *args, **kwargs)
+        return self._iter_response(r, info, key)
+
+    def _iter_response(self, r, info, key):
         start = time.time()
-        r = self.session.post(url, *args, allow_redirects=False, **kwargs)
-        self.track_request(url, r.status_code, start)
-        if r.status_code == 301:
-            raise HTTPError("301 redirect for POST")
-        if 400 <= r.status_code < 500:
-            raise HTTPError("{} Error: {}".format(r.status_code, r.json().get("message", "unknown")))
-        r.raise_for_status()
-        return r.json()
+        try:
+            for item in iter_json_array(r.iter_content(chunk_size=64 * 1024), key=key):
+                yield item
+        finally:
+            r.close()
+        # includes the time spent by the consumer between items
+        info["decode_time"] = time.time() - start
+        self.fire_hook("after_response", info)
+
+    def get_json_array(self, path, key=None, *args, **kwargs):
+        """GET a JSON array (or the array under key).
+
+        Responses with a Content-Length of at most STREAM_MIN_SIZE bytes
+        are decoded at once with the codec and returned as list. Larger
+        responses, or responses without a Content-Length, are streamed like
+        iter_json, and an iterator is returned.
+        """
+        kwargs["stream"] = True
+        r, info = self._send("get", path, *args, **kwargs)
+        length = r.headers.get("Content-Length")
+        if length is None or int(length) > self.STREAM_MIN_SIZE:
+            return self._iter_response(r, info, key)
+        try:
+            data = self._finish(info, r.content)
+        finally:
+            r.close()
+        if key is not None:
+            return data.get(key, [])
+        return data
+
+    def get(self, path, *args, **kwargs):
+        key = None if args else self._flight_key("get", path, kwargs)
+        if key is None:
+            return self._request("get", path, *args, **kwargs)
+        return self._inflight.do(key, lambda: self._request("get", path, **kwargs))
+
+    def post(self, path, *args, **kwargs):
+        return self._request("post", path, *args, **kwargs)
 
     def put(self, path, *args, **kwargs):
-        version = kwargs.pop("version", None)
-        url = self.to_url(path, version)
-        start = time.time()
-        r = self.session.put(url, *args, allow_redirects=False, **kwargs)
-        self.track_request(url, r.status_code, start)
-        if r.status_code == 301:
-            raise HTTPError("301 redirect for PUT")
-        if 400 <= r.status_code < 500:
-            raise HTTPError("{} Error: {}".format(r.status_code, r.json().get("message", "unknown")))
-        r.raise_for_status()
-        return r.json()
+        return self._request("put", path, *args, **kwargs)
 
     def delete(self, path, *args, **kwargs):
-        version = kwargs.pop("version", None)
-        url = self.to_url(path, version)
-        start = time.time()
-        r = self.session.delete(url, *args, **kwargs)
-        self.track_request(url, r.status_code, start)
-        if 400 <= r.status_code < 500:
-            raise HTTPError("{} Error: {}".format(r.status_code, r.json().get("message", "unknown")))
-        r.raise_for_status()
-        return r.json()
+        return self._request("delete", path, *args, **kwargs)
+
+    def paginate(self, path, params, page_size=100, prefetch=True, version=None):
+        """Lazy iterator over all results of an offset paginated GET endpoint.
+        """
+        return Paginator(lambda p: self.get(path, params=p, version=version), params,
+                         page_size=page_size, prefetch=prefetch)
 
 
 class LowLevelPublicAPI(BaseAPI):
-    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True):
+    LOOKUP_WORKERS = 8
+
+    def __init__(self, email=None, password=None, api_key=None, endpoint=None, tz_aware=True,
+                 store=None, **kwargs):
         """Initialize a new low level API client instance.
+
+        store is an optional SensordataStore, sensordata is then only
+        fetched for the time ranges missing in the store.
+        Further keyword arguments are passed to BaseAPI.
         """
         ep = endpoint or PUBLIC_API
-        super(LowLevelPublicAPI, self).__init__(ep, email=email, password=password, api_key=api_key, tz_aware=tz_aware)
+        super(LowLevelPublicAPI, self).__init__(ep, email=email, password=password, api_key=api_key,
+                                                tz_aware=tz_aware, **kwargs)
+        self.store = store
+        # LowLevelInternAPI used for bulk lookups, set by LowLevelAPI
+        self.internal = None
 
     def get_status(self):
         return self.get("/service/status")
@@ -183,135 +456,196 @@ class LowLevelPublicAPI(BaseAPI):
 
     def get_animal_by_id(self, animal_id):
         params = HDict({"animal_id": animal_id})
-        return self.get("/animal/by_id", params=params)
+        return self.cached_get("/animal/by_id", params=params)
 
+    @cached(maxsize=1024, ttl=5 * 60, enabled=lookup_cache_enabled, copy_result=True)
     def get_device_by_id(self, device_id):
         params = HDict({"device_id": device_id})
-        return self.get("/device/by_id", params=params)
+        return self.cached_get("/device/by_id", params=params)
 
+    @cached(maxsize=256, ttl=5 * 60, enabled=lookup_cache_enabled, copy_result=True)
     def get_organisation_by_id(self, organisation_id):
         params = HDict({"organisation_id": organisation_id})
-        return self.get("/organisation/by_id", params=params)
+        return self.cached_get("/organisation/by_id", params=params)
 
-    def get_device_sensordata(self, device_id, metric, from_date, to_date):
+    def _lookup_workers(self, max_workers):
+        if max_workers is None:
+            return max(self.max_workers, self.LOOKUP_WORKERS)
+        return max_workers
+
+    def get_animals_by_ids(self, animal_ids, max_workers=None):
+        return self.map_concurrent(self.get_animal_by_id, [(x,) for x in animal_ids],
+                                   max_workers=self._lookup_workers(max_workers))
+
+    def get_devices_by_ids(self, device_ids, max_workers=None):
+        return self.map_concurrent(self.get_device_by_id, [(x,) for x in device_ids],
+                                   max_workers=self._lookup_workers(max_workers))
+
+    def get_organisation_animals(self, organisation_id, max_workers=None):
+        """All animal documents of an organisation.
+
+        Uses the bulk endpoint of the internal API if available, otherwise
+        the animals are fetched with up to max_workers concurrent requests.
+        """
+        if self.internal is not None:
+            return self.internal.get_animals_by_organisation(organisation_id)
+        return self.get_animals_by_ids(self.get_organisation_animal_ids(organisation_id),
+                                       max_workers=max_workers)
+
+    def _fetch_sensordata(self, func, _id, metric, from_date, to_date, max_workers=None):
+        windows = splitTimeRange(from_date, to_date, 100)
         data = []
-        for f, t in splitTimeRange(from_date, to_date, 100):
-            data += self._get_device_sensordata(device_id, metric, f, t)["data"]
+        for res in self.map_concurrent(lambda f, t: func(_id, metric, f, t),
+                                       windows, max_workers=max_workers):
+            data += res["data"]
         return data
 
+    def _iter_sensordata_window(self, key, _id, metric, from_date, to_date):
+        params = HDict({key: _id, "metric": metric, "from_date": from_date, "to_date": to_date})
+        return self.iter_json("/data/query", key="data", params=params)
+
+    def _sensordata_window_arrays(self, key, _id, metric, from_date, to_date):
+        params = HDict({key: _id, "metric": metric, "from_date": from_date, "to_date": to_date})
+        return collect_arrays(self.get_json_array("/data/query", key="data", params=params))
+
+    def _fetch_sensordata_arrays(self, key, _id, metric, from_date, to_date, max_workers=None):
+        # every window is collected into its own arrays, joined in window order
+        parts = self.map_concurrent(
+            lambda f, t: self._sensordata_window_arrays(key, _id, metric, f, t),
+            splitTimeRange(from_date, to_date, 100), max_workers=max_workers)
+        ts, values = collect_arrays(())
+        for part_ts, part_values in parts:
+            ts.extend(part_ts)
+            values.extend(part_values)
+        return ts, values
+
+    def get_device_sensordata(self, device_id, metric, from_date, to_date, max_workers=None):
+        def fetch(f, t):
+            return self._fetch_sensordata(self._get_device_sensordata, device_id, metric, f, t, max_workers)
+        if self.store is not None:
+            return self.store.fetch("device", device_id, metric, int(from_date), int(to_date), fetch)
+        return fetch(from_date, to_date)
+
+    def iter_device_sensordata(self, device_id, metric, from_date, to_date):
+        """Stream (ts, value) pairs without decoding whole responses.
+        """
+        for f, t in splitTimeRange(from_date, to_date, 100):
+            for ts, value in self._iter_sensordata_window("device_id", device_id, metric, f, t):
+                yield ts, value
+
+    def get_device_sensordata_arrays(self, device_id, metric, from_date, to_date, max_workers=None):
+        """Sensordata as (array('q') timestamps, array('d') values), the
+        100 day windows are fetched with up to max_workers threads.
+        """
+        if self.store is not None:
+            return collect_arrays(self.get_device_sensordata(device_id, metric, from_date, to_date, max_workers))
+        return self._fetch_sensordata_arrays("device_id", device_id, metric, from_date, to_date, max_workers)
+
     def _get_device_sensordata(self, device_id, metric, from_date, to_date):
         params = HDict({"device_id": device_id, "metric": metric,
                         "from_date": from_date, "to_date": to_date})
         return self.get("/data/query", params=params)
 
-    def get_animal_sensordata(self, animal_id, metric, from_date, to_date):
-        data = []
+    def get_animal_sensordata(self, animal_id, metric, from_date, to_date, max_workers=None):
+        def fetch(f, t):
+            return self._fetch_sensordata(self._get_animal_sensordata, animal_id, metric, f, t, max_workers)
+        if self.store is not None:
+            return self.store.fetch("animal", animal_id, metric, int(from_date), int(to_date), fetch)
+        return fetch(from_date, to_date)
+
+    def iter_animal_sensordata(self, animal_id, metric, from_date, to_date):
+        """Stream (ts, value) pairs without decoding whole responses.
+        """
         for f, t in splitTimeRange(from_date, to_date, 100):
-            data += self._get_animal_sensordata(animal_id, metric, f, t)["data"]
-        return data
+            for ts, value in self._iter_sensordata_window("animal_id", animal_id, metric, f, t):
+                yield ts, value
+
+    def get_animal_sensordata_arrays(self, animal_id, metric, from_date, to_date, max_workers=None):
+        """Sensordata as (array('q') timestamps, array('d') values), the
+        100 day windows are fetched with up to max_workers threads.
+        """
+        if self.store is not None:
+            return collect_arrays(self.get_animal_sensordata(animal_id, metric, from_date, to_date, max_workers))
+        return self._fetch_sensordata_arrays("animal_id", animal_id, metric, from_date, to_date, max_workers)
 
     def _get_animal_sensordata(self, animal_id, metric, from_date, to_date):
         params = HDict({"animal_id": animal_id, "metric": metric,
                         "from_date": from_date, "to_date": to_date})
         return self.get("/data/query", params=params)
 
-    def get_animal_events(self, animal_id, from_date=None, to_date=None,
-                          limit=100, offset=0):
+    def iter_animal_events(self, animal_id, from_date=None, to_date=None,
+                           page_size=100, offset=0, prefetch=True):
         if from_date:
             from_date = int(from_date)
         if to_date:
             to_date = int(to_date)
 
-        params = HDict({"animal_id": animal_id, "limit": limit,
-                        "offset": offset, "from_date": from_date,
-                        "to_date": to_date})
-        all_events = []
-        while True:
-            events = self.get("/event/query", params=params)
-            all_events += events["data"]
-            if len(events["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = events["pagination"]["next_offset"]
-        return all_events
+        params = HDict({"animal_id": animal_id, "offset": offset,
+                        "from_date": from_date, "to_date": to_date})
+        return self.paginate("/event/query", params, page_size=page_size, prefetch=prefetch)
 
-    def get_device_events(self, device_id, from_date=None, to_date=None):
+    def get_animal_events(self, animal_id, from_date=None, to_date=None,
+                          limit=100, offset=0):
+        return list(self.iter_animal_events(animal_id, from_date, to_date,
+                                            page_size=limit, offset=offset))
+
+    def iter_device_events(self, device_id, from_date=None, to_date=None,
+                           page_size=100, prefetch=True):
         if from_date:
             from_date = int(from_date)
         if to_date:
             to_date = int(to_date)
 
-        params = HDict({"device_id": device_id, "limit": 100, "offset": 0,
+        params = HDict({"device_id": device_id, "offset": 0,
                         "from_date": from_date, "to_date": to_date})
-        all_events = []
-        while True:
-            events = self.get("/event/query", params=params)
-            all_events += events["data"]
-            if len(events["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = events["pagination"]["next_offset"]
-        return all_events
+        return self.paginate("/event/query", params, page_size=page_size, prefetch=prefetch)
 
-    def get_events_by_organisation(self, organisation_id, from_date, to_date, categories=None):
-        params = HDict({"organisation_id": organisation_id, "offset": 0, "limit": 100,
+    def get_device_events(self, device_id, from_date=None, to_date=None):
+        return list(self.iter_device_events(device_id, from_date, to_date))
+
+    def iter_events_by_organisation(self, organisation_id, from_date, to_date, categories=None,
+                                    page_size=100, prefetch=True):
+        params = HDict({"organisation_id": organisation_id, "offset": 0,
                         "from_date": int(from_date), "to_date": int(to_date),
                         "categories": categories})
-        all_res = []
-        while True:
-            res = self.get("/event/by_organisation", params=params)
-            all_res += res["data"]
-            if len(res["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = res["pagination"]["next_offset"]
-        return all_res
+        return self.paginate("/event/by_organisation", params, page_size=page_size, prefetch=prefetch)
+
+    def get_events_by_organisation(self, organisation_id, from_date, to_date, categories=None):
+        return list(self.iter_events_by_organisation(organisation_id, from_date, to_date,
+                                                     categories=categories))
 
     def get_annotation_by_id(self, annotation_id):
         params = HDict({"annotation_id": annotation_id})
         return self.get("/annotation/id", params=params)
 
-    def get_animal_annotations(self, animal_id, from_date, to_date):
-        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+    def iter_animal_annotations(self, animal_id, from_date, to_date, page_size=100, prefetch=True):
+        params = HDict({"to_date": to_date, "from_date": from_date,
                         "offset": 0, "animal_id": animal_id})
-        all_annotations = []
-        while True:
-            annotations = self.get("/annotation/query", params=params)
-            all_annotations += annotations["data"]
-            if len(annotations["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = annotations["pagination"]["next_offset"]
-        return all_annotations
+        return self.paginate("/annotation/query", params, page_size=page_size, prefetch=prefetch)
 
-    def get_annotations_by_class(self, annotation_class, from_date, to_date):
-        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+    def get_animal_annotations(self, animal_id, from_date, to_date):
+        return list(self.iter_animal_annotations(animal_id, from_date, to_date))
+
+    def iter_annotations_by_class(self, annotation_class, from_date, to_date, page_size=100, prefetch=True):
+        params = HDict({"to_date": to_date, "from_date": from_date,
                         "offset": 0, "annotation_class": annotation_class})
-        all_annotations = []
-        while True:
-            annotations = self.get("/annotation/query", params=params)
-            all_annotations += annotations["data"]
-            if len(annotations["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = annotations["pagination"]["next_offset"]
-        return all_annotations
+        return self.paginate("/annotation/query", params, page_size=page_size, prefetch=prefetch)
 
-    def get_annotations_by_organisation(self, organisation_id, from_date, to_date):
-        params = HDict({"to_date": to_date, "from_date": from_date, "limit": 100,
+    def get_annotations_by_class(self, annotation_class, from_date, to_date):
+        return list(self.iter_annotations_by_class(annotation_class, from_date, to_date))
+
+    def iter_annotations_by_organisation(self, organisation_id, from_date, to_date, page_size=100,
+                                         prefetch=True):
+        params = HDict({"to_date": to_date, "from_date": from_date,
                         "offset": 0, "organisation_id": organisation_id})
-        all_annotations = []
-        while True:
-            annotations = self.get("/annotation/query", params=params)
-            all_annotations += annotations["data"]
-            if len(annotations["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = annotations["pagination"]["next_offset"]
-        return all_annotations
+        return self.paginate("/annotation/query", params, page_size=page_size, prefetch=prefetch)
+
+    def get_annotations_by_organisation(self, organisation_id, from_date, to_date):
+        return list(self.iter_annotations_by_organisation(organisation_id, from_date, to_date))
 
+    @cached(maxsize=1, ttl=60 * 60, copy_result=True)
     def get_annotation_definition(self):
-        return self.get("/annotation/definition")
+        return self.cached_get("/annotation/definition")
 
     def insert_animal_annotation(self, animal_id, ts, end_ts, classes=None, attributes=None):
         p = HDict({"animal_id": animal_id, "ts": ts,
@@ -347,7 +681,7 @@ class LowLevelPublicAPI(BaseAPI):
 
     def get_testset_by_id(self, testset_id):
         params = HDict({"testset_id": testset_id})
-        res = self.get("/annotation/testset", params=params)
+        res = self.cached_get("/annotation/testset", params=params)
         return res
 
     def get_testset_by_name(self, name):
@@ -355,7 +689,7 @@ class LowLevelPublicAPI(BaseAPI):
         res = self.get("/annotation/testset/by_name", params=params)
         return res
 
-    @Memoize
+    @cached(maxsize=1024, ttl=60 * 60)
     def get_timezone_for_organisation_id(self, organisation_id):
         res = self.get_organisation_by_id(organisation_id)
         if res:
@@ -364,12 +698,17 @@ class LowLevelPublicAPI(BaseAPI):
 
 
 class LowLevelInternAPI(BaseAPI):
-    def __init__(self, endpoint, api_key=None, tz_aware=True):
+    BULK_MAX_POINTS = 50000
+    BULK_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, endpoint, api_key=None, tz_aware=True, **kwargs):
         """Initialize a new low level intern API client instance.
+
+        Further keyword arguments are passed to BaseAPI.
         """
         if not endpoint:
             raise ValueError("Endpoint needed for low level API")
-        super(LowLevelInternAPI, self).__init__(endpoint, api_key=api_key, tz_aware=tz_aware)
+        super(LowLevelInternAPI, self).__init__(endpoint, api_key=api_key, tz_aware=tz_aware, **kwargs)
 
     def get_status(self):
         return self._api_status()
@@ -392,35 +731,100 @@ class LowLevelInternAPI(BaseAPI):
               "data": list(data)}]
         return self.insertSensorDataBulk(d)[0]
 
-    def insertSensorDataBulk(self, sensordata):
-        data = HDict({"sensordata": list(sensordata)})
-        for s in sensordata:
-            d = s["data"]
-            for point in d:
-                if not isinstance(point[0], (int, float)):
-                    raise ValueError("Invalid TS Point: %s of metric %s",
-                                     (point, s["metric"]))
-                if not isinstance(point[1], (int, float)):
-                    raise ValueError("Invalid VALUE Point: %s of metric %s",
-                                     (point, s["metric"]))
-        res = self.put("/sensordatabulk", json=data, timeout=25)
-        return res
+    def insertSensorDataBulk(self, sensordata, **kwargs):
+        """Insert sensordata, see uploadSensorDataBulk for the keyword arguments.
+
+        Raises BulkUploadError (an HTTPError) if a chunk could not be
+        uploaded, the error itself if the upload fit into one chunk.
+        """
+        return self._bulk_result(self.uploadSensorDataBulk(sensordata, **kwargs))
 
     def updateSensorData(self, device_id, metric, data):
         d = [{"device_id": device_id, "metric": metric,
               "data": list(data)}]
         return self.updateSensorDataBulk(d)[0]
 
-    def updateSensorDataBulk(self, sensordata):
-        data = HDict({"sensordata": list(sensordata)})
-        for s in sensordata:
-            d = s["data"]
-            for point in d:
-                if not isinstance(point[0], (int, float)):
-                    raise ValueError("Invalid TS Point: %s", point)
-                if not isinstance(point[1], (int, float)):
-                    raise ValueError("Invalid VALUE Point: %s", point)
-        res = self.post("/sensordatabulk", json=data, timeout=25)
+    def updateSensorDataBulk(self, sensordata, **kwargs):
+        return self._bulk_result(self.uploadSensorDataBulk(sensordata, update=True, **kwargs))
+
+    def uploadSensorDataBulk(self, sensordata, update=False, max_points=None, max_bytes=None,
+                             max_workers=None, timeout=25, chunk_retries=2, drop_nan=False):
+        """Upload sensordata in chunks of at most max_points points and about
+        max_bytes bytes, with up to max_workers chunks in flight.
+
+        The data of a series is a list of (timestamp, value) pairs, a
+        (timestamps, values) tuple of numpy arrays, a (n, 2) array or a
+        pandas Series, see bulk.to_points. NaN/inf points raise a
+        ValueError unless drop_nan is set.
+
+        Chunks failing with a connection error, timeout or 5xx status are
+        retried up to chunk_retries times on their own. Returns the list of
+        BulkChunk, failed chunks have their error set and can be passed to
+        retrySensorDataBulk.
+        """
+        sensordata = check_sensordata(sensordata, drop_nan=drop_nan)
+        parts = split_sensordata(sensordata, max_points or self.BULK_MAX_POINTS,
+                                 max_bytes or self.BULK_MAX_BYTES)
+        chunks = [BulkChunk(i, x) for i, x in enumerate(parts)]
+        return self._upload_chunks(chunks, update, max_workers, timeout, chunk_retries)
+
+    def retrySensorDataBulk(self, chunks, update=False, max_workers=None, timeout=25, chunk_retries=2):
+        """Upload the failed chunks of a former uploadSensorDataBulk again.
+        """
+        failed = [c for c in chunks if not c.ok]
+        self._upload_chunks(failed, update, max_workers, timeout, chunk_retries)
+        return chunks
+
+    def _upload_chunks(self, chunks, update, max_workers, timeout, chunk_retries):
+        method = "post" if update else "put"
+        self.map_concurrent(lambda c: self._upload_chunk(c, method, timeout, chunk_retries),
+                            [(c,) for c in chunks], max_workers=max_workers)
+        return chunks
+
+    def _upload_chunk(self, chunk, method, timeout, retries):
+        kwargs = {"json": HDict({"sensordata": chunk.sensordata})}
+        if has_arrays(chunk.sensordata):
+            # requests would encode with the json module, which knows no arrays
+            self._encode_body(kwargs, compress=self.compress_requests)
+        attempt = 0
+        while True:
+            chunk.attempts += 1
+            try:
+                chunk.result = self._request(method, "/sensordatabulk", timeout=timeout, **kwargs)
+                chunk.error = None
+                return chunk
+            except (HTTPError, ConnectionError, Timeout) as e:
+                chunk.error = e
+                response = getattr(e, "response", None)
+                if isinstance(e, HTTPError) and (response is None or response.status_code < 500):
+                    return chunk
+                if attempt >= retries:
+                    return chunk
+            wait = self.retry.backoff(attempt) if self.retry is not None else 0.5 * 2 ** attempt
+            logging.warning("retry chunk %s of sensordatabulk in %.2f seconds: %s", chunk.index, wait, chunk.error)
+            attempt += 1
+            time.sleep(wait)
+
+    @classmethod
+    def _bulk_result(cls, chunks):
+        failed = [c.error for c in chunks if c.error is not None]
+        if failed:
+            if len(chunks) == 1:
+                # a plain upload raises like before chunking
+                raise failed[0]
+            raise BulkUploadError(chunks) from failed[0]
+        return cls._bulk_result_list([c.result for c in chunks])
+
+    @staticmethod
+    def _bulk_result_list(results):
+        if len(results) == 1:
+            return results[0]
+        res = []
+        for r in results:
+            if isinstance(r, list):
+                res.extend(r)
+            else:
+                res.append(r)
         return res
 
     def getSensorData(self, device_id, metric, from_date, to_date):
@@ -438,6 +842,13 @@ class LowLevelInternAPI(BaseAPI):
         res = self.get("/sensordatabulk", params=params, timeout=15)
         return res
 
+    def iterSensorDataBulk(self, device_id, metrics, from_date, to_date):
+        """Like getSensorDataBulk but yields one metric at a time from the stream.
+        """
+        params = HDict({"device_id": device_id, "metrics": list(metrics),
+                        "from_date": from_date, "to_date": to_date})
+        return self.iter_json("/sensordatabulk", params=params, timeout=15)
+
     def getLastSensorData(self, device_id, metric):
         return self.getLastSensorDataBulk(device_id, [metric])[0]
 
@@ -482,6 +893,7 @@ class LowLevelInternAPI(BaseAPI):
         res = self.delete("/event", params=p)
         return res
 
+    @cached(maxsize=1024, ttl=5 * 60, enabled=lookup_cache_enabled, copy_result=True)
     def getDevice(self, device_id, with_animal=True, with_organisation=True,
                   with_allmeta=True):
         data = HDict({"device_id": device_id,
@@ -491,6 +903,7 @@ class LowLevelInternAPI(BaseAPI):
         res = self.get("/device", params=data)
         return res
 
+    @cached(maxsize=256, ttl=5 * 60, enabled=lookup_cache_enabled, copy_result=True)
     def getOrganisation(self, organisation_id):
         p = HDict({"organisation_id": organisation_id})
         res = self.get("/organisation/by_id", params=p, version="v1")
@@ -501,18 +914,14 @@ class LowLevelInternAPI(BaseAPI):
         res = self.get("/user/by_id", params=p, version="v1")
         return res
 
-    def query_organisations(self, name_search_string=None, partner_id=None):
-        params = HDict({"name_search_string": name_search_string, "limit": 100,
+    def iter_organisations(self, name_search_string=None, partner_id=None, page_size=100, prefetch=True):
+        params = HDict({"name_search_string": name_search_string,
                         "offset": 0, "partner_id": partner_id})
-        all_res = []
-        while True:
-            res = self.get("/organisation/list", params=params, version="v1")
-            all_res += res["data"]
-            if len(res["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = res["pagination"]["next_offset"]
-        return all_res
+        return self.paginate("/organisation/list", params, page_size=page_size, prefetch=prefetch,
+                             version="v1")
+
+    def query_organisations(self, name_search_string=None, partner_id=None):
+        return list(self.iter_organisations(name_search_string, partner_id))
 
     def getOrganisationList(self):
         res = self.get("/organisationlist")
@@ -557,18 +966,12 @@ class LowLevelInternAPI(BaseAPI):
         res = self.get("/productionevents", params=p)
         return res
 
+    def iter_users(self, email_search_string=None, page_size=100, prefetch=True):
+        params = HDict({"email_search_string": email_search_string, "offset": 0})
+        return self.paginate("/user/list", params, page_size=page_size, prefetch=prefetch, version="v1")
+
     def query_users(self, email_search_string=None):
-        params = HDict({"email_search_string": email_search_string, "limit": 100,
-                        "offset": 0})
-        all_res = []
-        while True:
-            res = self.get("/user/list", params=params, version="v1")
-            all_res += res["data"]
-            if len(res["data"]) < params["limit"]:
-                break
-            else:
-                params["offset"] = res["pagination"]["next_offset"]
-        return all_res
+        return list(self.iter_users(email_search_string=email_search_string))
 
     def get_hidden_shares(self, user_id):
         params = HDict({"user_id": user_id})
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# coding: utf8
+
+import time
+import threading
+import collections
+
+
+class Req(object):
+    def __init__(self, url, status, start, end=None):
+        self.url = url
+        self.start = start
+        self.status = status
+        if end is None:
+            self.end = time.time()
+        else:
+            self.end = end
+
+    @property
+    def timer(self):
+        return self.end - self.start
+
+
+def percentile(values, q):
+    """Nearest rank percentile (q in 0..100) of an unsorted sequence.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    idx = int(round(q / 100.0 * (len(values) - 1)))
+    return values[idx]
+
+
+class EndpointStats(object):
+    QUANTILES = (50, 95, 99)
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_time = 0.0
+        self.status = collections.Counter()
+        # ring buffer of the latest latencies for the percentiles
+        self.latencies = collections.deque(maxlen=window)
+
+    def to_dict(self):
+        latencies = list(self.latencies)
+        d = {"count": self.count, "errors": self.errors, "retries": self.retries,
+             "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+             "total_time": self.total_time, "status": dict(self.status)}
+        for q in self.QUANTILES:
+            d["p{}".format(q)] = percentile(latencies, q)
+        return d
+
+
+class Metrics(object):
+    def __init__(self, window=1000, history=100):
+        """Request instrumentation of one API client.
+
+        Per endpoint ("GET /data/query") counters, status codes, transferred
+        bytes, retries and the latencies of the last window requests. The
+        last history requests are kept as Req objects.
+        """
+        self.window = window
+        self.counter = 0
+        self.retries = 0
+        self.recent = collections.deque(maxlen=history)
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, method, path):
+        key = "{} {}".format(method.upper(), path)
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointStats(self.window)
+        return self.endpoints[key]
+
+    def record(self, method, path, url, status, start, end=None, bytes_in=0, bytes_out=0):
+        req = Req(url, status, start, end)
+        with self._lock:
+            self.counter += 1
+            self.recent.append(req)
+            e = self._endpoint(method, path)
+            e.count += 1
+            e.total_time += req.timer
+            e.latencies.append(req.timer)
+            e.bytes_in += bytes_in
+            e.bytes_out += bytes_out
+            if status is None:
+                e.errors += 1
+                e.status["error"] += 1
+            else:
+                if status >= 400:
+                    e.errors += 1
+                e.status[status] += 1
+
+    def record_retry(self, method, path):
+        with self._lock:
+            self.retries += 1
+            self._endpoint(method, path).retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": self.counter, "retries": self.retries,
+                    "endpoints": dict((k, v.to_dict()) for k, v in self.endpoints.items())}
+
+    def to_prometheus(self, prefix="sxapi"):
+        """Export the metrics in the Prometheus text exposition format.
+        """
+        snap = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+
+        def label(endpoint, **extra):
+            method, path = endpoint.split(" ", 1)
+            labels = [("method", method), ("path", path)] + sorted(extra.items())
+            return ",".join('{}="{}"'.format(k, v) for k, v in labels)
+
+        endpoints = sorted(snap["endpoints"].items())
+        family("request_duration_seconds", "summary", "Request latency")
+        for k, v in endpoints:
+            for q in EndpointStats.QUANTILES:
+                if v["p{}".format(q)] is not None:
+                    lines.append("{}_request_duration_seconds{{{}}} {}".format(
+                        prefix, label(k, quantile=q / 100.0), v["p{}".format(q)]))
+            lines.append("{}_request_duration_seconds_sum{{{}}} {}".format(prefix, label(k), v["total_time"]))
+            lines.append("{}_request_duration_seconds_count{{{}}} {}".format(prefix, label(k), v["count"]))
+        family("responses_total", "counter", "Responses by status code")
+        for k, v in endpoints:
+            for status, n in sorted(v["status"].items(), key=lambda x: str(x[0])):
+                lines.append("{}_responses_total{{{}}} {}".format(prefix, label(k, status=status), n))
+        for name, field, help_text in (("retries_total", "retries", "Retried requests"),
+                                       ("received_bytes_total", "bytes_in", "Bytes received"),
+                                       ("sent_bytes_total", "bytes_out", "Bytes sent")):
+            family(name, "counter", help_text)
+            for k, v in endpoints:
+                lines.append("{}_{}{{{}}} {}".format(prefix, name, label(k), v[field]))
+        return "\n".join(lines) + "\n"
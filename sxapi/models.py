@@ -1,10 +1,14 @@
 #!/usr/bin/python
 # coding: utf8
 
+import math
 import time
+import logging
 import pendulum
 import datetime
-import math
+import calendar
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     import pandas as pd
@@ -16,7 +20,96 @@ except ImportError:
     np = None
 
 
-from .helper import fromTS, toTS
+from .helper import fromTS, toTS, fromTS_array, localize_array, splitTimeRange
+from .stream import collect_arrays
+
+
+DAY_US = 24 * 60 * 60 * 10 ** 6
+
+
+def epoch_us(dt):
+    """UTC epoch microseconds of a (naive UTC or aware) datetime.
+    """
+    dt = pendulum.instance(dt)
+    return calendar.timegm(dt.utctimetuple()) * 10 ** 6 + dt.microsecond
+
+
+def dim_grid(from_dt, to_dt, interval):
+    """Ascending epoch microseconds to_dt, to_dt - interval, ... >= from_dt.
+    """
+    to_us = epoch_us(to_dt)
+    step = int(round(interval * 10 ** 6))
+    diff = to_us - epoch_us(from_dt)
+    n = diff // step + 1 if diff >= 0 else 0
+    return to_us - np.arange(n - 1, -1, -1, dtype=np.int64) * step
+
+
+DIM_BLOCK_ELEMENTS = 4 * 1024 * 1024
+
+
+def iter_dim_blocks(calvings, grid, block_size=None):
+    """DIM of several animals on a grid, in blocks of block_size columns.
+
+    calvings is a list of (calvings, starts) per animal, see
+    Animal.calving_epochs. Yields (grid block, animals x block array),
+    the values are the same as Animal.dim_array. Without block_size the
+    blocks are sized to keep the temporary arrays at about
+    DIM_BLOCK_ELEMENTS elements.
+    """
+    count = len(calvings)
+    n_lac = np.array([len(c) for c, _ in calvings], dtype=np.int64)
+    width = max(1, n_lac.max() if count else 1)
+    # padded starts never match
+    pad_calvings = np.zeros((count, width), dtype=np.int64)
+    pad_starts = np.full((count, width), np.iinfo(np.int64).max, dtype=np.int64)
+    for i, (c, st) in enumerate(calvings):
+        pad_calvings[i, :len(c)] = c
+        pad_starts[i, :len(st)] = st
+    if block_size is None:
+        block_size = max(1, DIM_BLOCK_ELEMENTS // max(1, count))
+    n = len(grid)
+    for b in range(0, n, block_size):
+        e = min(n, b + block_size)
+        g = grid[b:e]
+        # time since the latest calving starting at most 14 days later, else the first one
+        diff = np.empty((count, e - b), dtype=np.int64)
+        diff[:] = -pad_calvings[:, :1]
+        mask = np.empty(diff.shape, dtype=bool)
+        for i in range(1, width):
+            np.less_equal(pad_starts[:, i:i + 1], g, out=mask)
+            np.copyto(diff, -pad_calvings[:, i:i + 1], where=mask)
+        diff += g
+        dims = diff.astype(np.float64)
+        dims /= DAY_US
+        np.floor(dims, out=dims)
+        # walking back in time, the sentinel is only set on steps which
+        # already started at the first calving: the next step is before
+        # the second one starts
+        mask[:] = True
+        if width > 1:
+            following = grid[b + 1:e + 1]
+            np.less(following, pad_starts[:, 1:2], out=mask[:, :len(following)])
+            if len(following) < e - b:
+                mask[:, -1] = n_lac <= 1
+        mask &= dims < -14
+        dims[mask] = -14.5
+        dims[n_lac == 0] = -14.5
+        yield g, dims
+
+
+def align_columns(columns):
+    """Align (timestamps, values) columns on the sorted union of their timestamps.
+
+    Returns the timestamps and a 2d float array with one column per input,
+    NaN where a column has no value.
+    """
+    if not columns:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    index = np.unique(np.concatenate([ts for ts, _ in columns]))
+    out = np.full((len(index), len(columns)), np.nan)
+    for i, (ts, values) in enumerate(columns):
+        out[np.searchsorted(index, ts), i] = values
+    return index, out
 
 
 class HDict(dict):
@@ -25,6 +118,8 @@ class HDict(dict):
 
 
 class APIObject(object):
+    __slots__ = ("api", "_id", "_data", "_timezone", "_tz_aware")
+
     def __init__(self, api, _id):
         self.api = api
         self._id = _id
@@ -60,7 +155,7 @@ class APIObject(object):
 
     @property
     def data(self):
-        if not self._data:
+        if self._data is None:
             self._data = self.get_data()
         return self._data
 
@@ -72,6 +167,8 @@ class APIObject(object):
 
 
 class DataMixin(object):
+    __slots__ = ()
+
     DEFAULT_DAYS_BACK = 30
 
     def get_measurements(self, metric, from_date=None, to_date=None, days_back=None):
@@ -88,7 +185,14 @@ class DataMixin(object):
         return Sensordata(api=self.api, parent=self, metric=metric,
                           from_date=my_from, to_date=my_to)
 
-    def get_frame(self, metrics, from_date=None, to_date=None, days_back=None):
+    def get_frame(self, metrics, from_date=None, to_date=None, days_back=None, max_workers=None):
+        """DataFrame with one column per metric on the union of their timestamps.
+
+        The metrics are fetched concurrently (up to max_workers, by default
+        as many as the connection pool of the client allows), for devices
+        with a single bulk query per time window if the internal API is
+        available.
+        """
         if days_back is None:
             days_back = self.DEFAULT_DAYS_BACK
 
@@ -99,11 +203,37 @@ class DataMixin(object):
             my_to = to_date
             my_from = from_date
 
-        d = []
-        for m in metrics:
-            d.append(Sensordata(api=self.api, parent=self, metric=m,
-                                from_date=my_from, to_date=my_to).to_series().to_frame())
-        return pd.concat(d, join="outer", axis=1)
+        metrics = list(metrics)
+        columns = self._fetch_columns(metrics, my_from, my_to, max_workers)
+        index, values = align_columns(columns)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(index.view('datetime64[s]')), columns=metrics)
+
+    def _fetch_columns(self, metrics, from_date, to_date, max_workers):
+        internal = getattr(self.api, "internal", None)
+        if isinstance(self, Device) and internal is not None:
+            windows = list(splitTimeRange(toTS(from_date), toTS(to_date), 100))
+            if max_workers is None:
+                max_workers = min(len(windows), internal.pool_maxsize)
+            results = self.api.map_concurrent(
+                lambda f, t: internal.getSensorDataBulk(self._id, metrics, f, t), windows,
+                max_workers=max_workers)
+            data = dict((m, []) for m in metrics)
+            for res in results:
+                for m, item in zip(metrics, res):
+                    key = item.get("metric", m)
+                    data[key if key in data else m].extend(item["data"])
+            columns = []
+            for m in metrics:
+                ts, values = collect_arrays(data[m])
+                columns.append((np.frombuffer(ts, dtype=ts.typecode), np.frombuffer(values, dtype=values.typecode)))
+            return columns
+        sensordata = [Sensordata(api=self.api, parent=self, metric=m, from_date=from_date, to_date=to_date)
+                      for m in metrics]
+        if max_workers is None:
+            # every metric fetches its time windows with up to api.max_workers connections
+            max_workers = min(len(metrics), self.api.pool_maxsize // max(1, self.api.max_workers))
+        self.api.map_concurrent(lambda s: s.arrays, [(s,) for s in sensordata], max_workers=max_workers)
+        return [s.to_numpy() for s in sensordata]
         # def get_frame(self, metrics, days_back=None):
         #     frames = [self.get_series(x, days_back=days_back).to_frame(name=x) for x in metrics]
         #     frame = pd.concat(frames, join="outer", axis=1)
@@ -111,6 +241,8 @@ class DataMixin(object):
 
 
 class EventMixin(object):
+    __slots__ = ()
+
     DEFAULT_DAYS_BACK = 30
 
     def get_events(self, from_date=None, to_date=None, days_back=None):
@@ -129,6 +261,8 @@ class EventMixin(object):
 
 
 class Event(APIObject):
+    __slots__ = ()
+
     @property
     def event_type(self):
         return self.data["event_type"]
@@ -148,30 +282,110 @@ class Event(APIObject):
 
 class Events(object):
     def __init__(self, api, parent, from_date=None, to_date=None):
+        """Events of an animal or device, stored column wise.
+
+        timestamps (int64, ascending) and event_types (categorical) are
+        arrays, raw holds the event dicts (metadata untouched) in the same
+        order. Event objects are only created for accessed elements.
+        Without numpy timestamps is a list; event_types, to_series and
+        to_frame need pandas.
+        """
         self.api = api
         self.parent = parent
         self.from_date = from_date
         self.to_date = to_date
-        self._data = {}
+        self._raw = None
+        self._timestamps = None
+        self._event_types = None
+        self._events = None
         assert isinstance(self.parent, Animal) or isinstance(self.parent, Device)
 
+    def _load(self):
+        f = toTS(self.from_date)
+        t = toTS(self.to_date)
+        if isinstance(self.parent, Animal):
+            raw = self.api.get_animal_events(self.parent._id, f, t)
+        else:
+            raw = self.api.get_device_events(self.parent._id, f, t)
+        if np is None:
+            self._raw = sorted(raw, key=lambda x: x["timestamp"])
+            self._timestamps = [x["timestamp"] for x in self._raw]
+        else:
+            ts = np.fromiter((x["timestamp"] for x in raw), dtype=np.int64, count=len(raw))
+            order = np.argsort(ts, kind="stable")
+            self._timestamps = ts[order]
+            self._raw = [raw[i] for i in order.tolist()]
+        self._events = [None] * len(self._raw)
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            self._load()
+        return self._raw
+
+    @property
+    def timestamps(self):
+        if self._raw is None:
+            self._load()
+        return self._timestamps
+
+    @property
+    def event_types(self):
+        if self._event_types is None:
+            self._event_types = pd.Categorical([x.get("event_type") for x in self.raw])
+        return self._event_types
+
+    def __len__(self):
+        return len(self.raw)
+
+    def _event(self, i):
+        event = self._events[i]
+        if event is None:
+            event = self._events[i] = Event.create_from_data(api=self.api, data=self._raw[i],
+                                                             timezone=self.parent.timezone)
+        return event
+
+    def __getitem__(self, i):
+        raw = self.raw
+        if isinstance(i, slice):
+            return [self._event(j) for j in range(*i.indices(len(raw)))]
+        if i < 0:
+            i += len(raw)
+        if not 0 <= i < len(raw):
+            raise IndexError("event index out of range")
+        return self._event(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._event(i)
+
     @property
     def data(self):
-        if not self._data:
-            f = toTS(self.from_date)
-            t = toTS(self.to_date)
-            if isinstance(self.parent, Animal):
-                self._data = self.api.get_animal_events(self.parent._id, f, t)
-            elif isinstance(self.parent, Device):
-                self._data = self.api.get_device_events(self.parent._id, f, t)
-            self._data = [Event.create_from_data(api=self.api, data=x, timezone=parent.timezone) for x in self._data]
-            self._data.sort(key=lambda x: x.date)
-        return self._data
+        """All events as list of Event objects, prefer the columns.
+        """
+        return list(self)
+
+    def _index(self):
+        # naive values like Event.date, UTC if tz_aware
+        if not self.api.tz_aware:
+            return fromTS_array(self.timestamps, tz_aware=False)
+        index = fromTS_array(self.timestamps, self.parent.timezone)
+        return index.tz_convert(None).values.astype('datetime64[s]')
 
     def to_series(self):
-        return pd.Series([x.event_type for x in self.data],
-                         index=np.array([x.date for x in self.data]).astype('datetime64[s]'),
-                         name="event")
+        return pd.Series(self.event_types, index=self._index(), name="event")
+
+    def to_frame(self):
+        """All events as DataFrame indexed like to_series, with one column
+        per top level field and metadata flattened to "metadata.<key>".
+        """
+        index = self._index()
+        if not len(index):
+            return pd.DataFrame({"event_type": self.event_types}, index=index)
+        frame = pd.json_normalize(self.raw)
+        frame.index = index
+        frame["event_type"] = self.event_types
+        return frame.drop(columns=["timestamp"])
 
     def to_list(self):
         return self.data
@@ -184,6 +398,8 @@ class Events(object):
 
 
 class User(APIObject):
+    __slots__ = ("name",)
+
     def __init__(self, api, data):
         self.api = api
         self._data = data
@@ -203,24 +419,46 @@ class Sensordata(object):
         self.metric = metric
         self.from_date = from_date
         self.to_date = to_date
-        self._data = {}
+        self._arrays = None
         assert isinstance(self.parent, Animal) or isinstance(self.parent, Device)
 
     @property
-    def data(self):
-        if not self._data:
+    def arrays(self):
+        """The data as (array('q') timestamps, array('d') values), missing
+        values are NaN.
+        """
+        if self._arrays is None:
             f = toTS(self.from_date)
             t = toTS(self.to_date)
             if isinstance(self.parent, Animal):
-                self._data = self.api.get_animal_sensordata(self.parent._id, self.metric, f, t)
+                self._arrays = self.api.get_animal_sensordata_arrays(self.parent._id, self.metric, f, t)
             elif isinstance(self.parent, Device):
-                self._data = self.api.get_device_sensordata(self.parent._id, self.metric, f, t)
-        return self._data
+                self._arrays = self.api.get_device_sensordata_arrays(self.parent._id, self.metric, f, t)
+        return self._arrays
+
+    def to_numpy(self):
+        """(timestamps, values) as int64 and float64 arrays sharing the memory of arrays.
+        """
+        ts, values = self.arrays
+        return np.frombuffer(ts, dtype=ts.typecode), np.frombuffer(values, dtype=values.typecode)
+
+    def __len__(self):
+        return len(self.arrays[0])
+
+    def __iter__(self):
+        ts, values = self.arrays
+        return zip(ts, values)
+
+    @property
+    def data(self):
+        """The data as list of [ts, value], prefer arrays or iterating.
+        """
+        return [[t, v] for t, v in self]
 
     def to_series(self):
-        return pd.Series([x[1] for x in self.data],
-                         index=np.array([x[0] for x in self.data]).astype('datetime64[s]'),
-                         name=self.metric)
+        ts, values = self.to_numpy()
+        return pd.Series(values, index=pd.DatetimeIndex(ts.view('datetime64[s]')),
+                         name=self.metric, copy=False)
 
     def __str__(self):
         return "<{}({}.{})>".format(self.__class__.__name__, getattr(self.parent, "_id", "unknown"),
@@ -237,11 +475,20 @@ class Sensordata(object):
 
 
 class Organisation(APIObject):
-    def __init__(self, api, _id):
+    __slots__ = ("_animals", "_events", "_devices", "eager")
+
+    DEFAULT_DAYS_BACK = 30
+    PANEL_WORKERS = 8
+
+    def __init__(self, api, _id, eager=False):
+        """With eager all animals (devices) are loaded in bulk the first
+        time animals (devices) is accessed instead of one request per object.
+        """
         super(Organisation, self).__init__(api, _id)
         self._animals = None
         self._events = None
         self._devices = None
+        self.eager = eager
 
     def get_data(self):
         return self.api.get_organisation_by_id(self._id)
@@ -268,20 +515,148 @@ class Organisation(APIObject):
     def get_animal_ids(self):
         return self.api.get_organisation_animal_ids(self._id)
 
+    def _loaded_animals(self, max_workers=None):
+        # animals of the lazy animals property have no payload yet, loading
+        # them one by one would be a request per animal
+        if self._animals and all(a._data is not None for a in self._animals):
+            return self._animals
+        return self.load_animals(max_workers=max_workers)
+
+    def iter_dim_blocks(self, from_dt, to_dt, interval=60*60, animals=None, block_size=None,
+                        max_workers=None):
+        """DIM of all (or the given) animals in time blocks, see models.iter_dim_blocks.
+        """
+        if animals is None:
+            animals = self._loaded_animals(max_workers)
+        calvings = [a.calving_epochs() for a in animals]
+        return iter_dim_blocks(calvings, dim_grid(from_dt, to_dt, interval), block_size)
+
+    def dim_matrix(self, from_dt, to_dt, interval=60*60, animals=None, block_size=None,
+                   max_workers=None, dtype=None):
+        """Days in milk of all animals (bulk loaded) on a shared grid.
+
+        Returns (animal ids, grid in UTC epoch microseconds, animals x grid
+        matrix of dtype, default float32), see Animal.dim_array.
+        """
+        if animals is None:
+            animals = self._loaded_animals(max_workers)
+        grid = dim_grid(from_dt, to_dt, interval)
+        out = np.empty((len(animals), len(grid)), dtype=dtype or np.float32)
+        pos = 0
+        for g, dims in self.iter_dim_blocks(from_dt, to_dt, interval, animals, block_size):
+            out[:, pos:pos + len(g)] = dims
+            pos += len(g)
+        return [a._id for a in animals], grid, out
+
+    def get_arrays(self, metrics, from_date=None, to_date=None, days_back=None, animal_ids=None,
+                   max_workers=None, progress=None):
+        """Sensordata of all (or the given) animals, up to max_workers animals at once.
+
+        Returns ({animal_id: (timestamps, values)}, {animal_id: exception})
+        with values a 2d array with one column per metric (see
+        align_columns). Duplicate animal ids are fetched once.
+        progress(done, total, animal_id, error) is called after every
+        animal.
+        """
+        if days_back is None:
+            days_back = self.DEFAULT_DAYS_BACK
+
+        if from_date is None or to_date is None:
+            my_to = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+            my_from = datetime.datetime.utcnow() - datetime.timedelta(days=days_back)
+        else:
+            my_to = to_date
+            my_from = from_date
+
+        metrics = list(metrics)
+        if animal_ids is None:
+            animal_ids = self.get_animal_ids()
+        animal_ids = list(collections.OrderedDict.fromkeys(animal_ids))
+
+        def fetch(animal_id):
+            animal = Animal(api=self.api, _id=animal_id)
+            return align_columns(animal._fetch_columns(metrics, my_from, my_to, 1))
+
+        arrays = {}
+        failures = {}
+        if not animal_ids:
+            return arrays, failures
+        # login once before the workers start
+        self.api.session
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.PANEL_WORKERS, len(animal_ids))) as executor:
+            futures = dict((executor.submit(fetch, x), x) for x in animal_ids)
+            for done, future in enumerate(as_completed(futures), 1):
+                animal_id = futures[future]
+                error = future.exception()
+                if error is None:
+                    arrays[animal_id] = future.result()
+                else:
+                    logging.warning("sensordata of animal %s failed: %s", animal_id, error)
+                    failures[animal_id] = error
+                if progress is not None:
+                    progress(done, len(animal_ids), animal_id, error)
+        return arrays, failures
+
+    def get_frame(self, metrics, from_date=None, to_date=None, days_back=None, animal_ids=None,
+                  max_workers=None, progress=None):
+        """DataFrame of all (or the given) animals with an (animal_id,
+        timestamp) MultiIndex and one column per metric.
+
+        Returns (frame, {animal_id: exception}) with the animals which
+        failed, see get_arrays.
+        """
+        metrics = list(metrics)
+        if animal_ids is None:
+            animal_ids = self.get_animal_ids()
+        animal_ids = list(collections.OrderedDict.fromkeys(animal_ids))
+        arrays, failures = self.get_arrays(metrics, from_date, to_date, days_back, animal_ids,
+                                           max_workers, progress)
+        ids = [x for x in animal_ids if x in arrays]
+        if ids:
+            ts = np.concatenate([arrays[x][0] for x in ids])
+            values = np.vstack([arrays[x][1] for x in ids])
+        else:
+            ts = np.empty(0, dtype=np.int64)
+            values = np.empty((0, len(metrics)))
+        animals = np.repeat(np.array(ids, dtype=object), [len(arrays[x][0]) for x in ids])
+        index = pd.MultiIndex.from_arrays([animals, pd.DatetimeIndex(ts.view('datetime64[s]'))],
+                                          names=["animal_id", "timestamp"])
+        return pd.DataFrame(values, index=index, columns=metrics), failures
+
+    def load_devices(self, max_workers=None):
+        timezone = self.timezone
+        self._devices = [Device.create_from_data(api=self.api, data=x, timezone=timezone)
+                         for x in self.api.get_devices_by_ids(self.get_device_ids(), max_workers=max_workers)]
+        return self._devices
+
+    def load_animals(self, max_workers=None):
+        timezone = self.timezone
+        self._animals = [Animal.create_from_data(api=self.api, data=x, timezone=timezone)
+                         for x in self.api.get_organisation_animals(self._id, max_workers=max_workers)]
+        return self._animals
+
     @property
     def devices(self):
         if not self._devices:
-            self._devices = [Device(api=self.api, _id=x) for x in self.get_device_ids()]
+            if self.eager:
+                self.load_devices()
+            else:
+                self._devices = [Device(api=self.api, _id=x) for x in self.get_device_ids()]
         return self._devices
 
     @property
     def animals(self):
         if not self._animals:
-            self._animals = [Animal(api=self.api, _id=x) for x in self.get_animal_ids()]
+            if self.eager:
+                self.load_animals()
+            else:
+                self._animals = [Animal(api=self.api, _id=x) for x in self.get_animal_ids()]
         return self._animals
 
 
 class Device(APIObject, DataMixin, EventMixin):
+    __slots__ = ("_sensordata", "_events")
+
     def __init__(self, api, _id):
         super(Device, self).__init__(api, _id)
         self._sensordata = None
@@ -304,6 +679,8 @@ class Device(APIObject, DataMixin, EventMixin):
 
 
 class Lactation(APIObject):
+    __slots__ = ()
+
     def __init__(self, api, _id):
         super(Lactation, self).__init__(api, _id)
 
@@ -331,6 +708,8 @@ class Lactation(APIObject):
 
 
 class Heat(APIObject):
+    __slots__ = ()
+
     def __init__(self, api, _id):
         super(Heat, self).__init__(api, _id)
 
@@ -358,11 +737,14 @@ class Heat(APIObject):
 
 
 class Animal(APIObject, DataMixin, EventMixin):
+    __slots__ = ("_sensordata", "_events", "_lactations", "_calvings", "_heats")
+
     def __init__(self, api, _id):
         super(Animal, self).__init__(api, _id)
         self._sensordata = None
         self._events = None
         self._lactations = None
+        self._calvings = None
         self._heats = None
 
     def get_data(self):
@@ -378,7 +760,64 @@ class Animal(APIObject, DataMixin, EventMixin):
     def to_dim(self, dt):
         return self.fast_dim_range(dt, dt)[0][1]
 
+    def calving_epochs(self):
+        """Calving days (local midnight) and the days 14 days before as
+        ascending UTC epoch microseconds.
+        """
+        if self._calvings is None:
+            ts = np.sort(np.array([lac["calving_date"] for lac in self.data["lactations"]], dtype=np.int64))
+            days = fromTS_array(ts, tz_aware=False).astype('datetime64[D]')
+            timezone = self.timezone if self._tz_aware else None
+            self._calvings = tuple(
+                localize_array(d, timezone).tz_convert(None).values.astype('datetime64[us]').view(np.int64)
+                for d in (days, days - np.timedelta64(14, 'D')))
+        return self._calvings
+
+    def dim_array(self, from_dt, to_dt, interval=60*60):
+        """Days in milk on the grid to_dt, to_dt - interval, ... >= from_dt.
+
+        Returns the grid (ascending UTC epoch microseconds) and the DIM as
+        int64 and float64 arrays. The DIM counts from the latest calving at
+        most 14 days ahead, -14.5 if there is none (see fast_dim_range).
+        """
+        grid = dim_grid(from_dt, to_dt, interval)
+        n = len(grid)
+        dims = np.full(n, -14.5)
+        calvings, starts = self.calving_epochs()
+        if not len(calvings) or n == 0:
+            return grid, dims
+        # latest calving starting at most 14 days later, else the first one
+        idx = np.maximum(np.searchsorted(starts, grid, side="right") - 1, 0)
+        dims = ((grid - calvings[idx]) // DAY_US).astype(np.float64)
+        # walking back in time, the sentinel is only set on steps which
+        # already started at the first calving
+        previous = np.empty(n, dtype=np.int64)
+        previous[:-1] = idx[1:]
+        previous[-1] = len(calvings) - 1
+        dims[(previous == 0) & (dims < -14)] = -14.5
+        return grid, dims
+
+    def dim_series(self, from_dt, to_dt, interval=60*60):
+        """DIM as pandas Series indexed by (UTC) datetimes, see dim_array.
+        """
+        grid, dims = self.dim_array(from_dt, to_dt, interval)
+        return pd.Series(dims, index=pd.DatetimeIndex(grid.view('datetime64[us]')), name="dim")
+
     def fast_dim_range(self, from_dt, to_dt, interval=60*60, timestamp=False):
+        if np is None or pd is None:
+            return self._dim_range_loop(from_dt, to_dt, interval, timestamp)
+        grid, dims = self.dim_array(from_dt, to_dt, interval)
+        dims = [d if d == -14.5 else int(d) for d in dims.tolist()]
+        cdt = pendulum.instance(to_dt)
+        if timestamp is True:
+            # same as toTS, which counts from 1970-01-01 in the timezone of cdt
+            base = epoch_us(cdt.replace(year=1970, month=1, day=1, hour=0, minute=0, second=0, microsecond=0))
+            return list(zip(((grid - base) // 10 ** 6).tolist(), dims))
+        n = len(dims)
+        return [(cdt.subtract(seconds=(n - 1 - i) * interval), d) for i, d in enumerate(dims)]
+
+    def _dim_range_loop(self, from_dt, to_dt, interval=60*60, timestamp=False):
+        # pendulum only version of fast_dim_range, used without numpy/pandas
         out = []
         cdt = pendulum.instance(to_dt)
 
@@ -399,7 +838,7 @@ class Animal(APIObject, DataMixin, EventMixin):
                 out.append((cdt, dim))
                 cdt = cdt.subtract(seconds=interval)
                 continue
-            elif lac_idx < len(all_lactations):
+            else:
                 dim = math.floor((cdt - all_lactations[-lac_idx]).total_seconds() / (24*60*60))
                 while len(all_lactations) > lac_idx and all_lactations[-lac_idx].subtract(days=14) > cdt:
                     lac_idx += 1
@@ -407,8 +846,6 @@ class Animal(APIObject, DataMixin, EventMixin):
                 out.append((cdt, dim))
                 cdt = cdt.subtract(seconds=interval)
                 continue
-            else:
-                assert False  # WTF
         if timestamp is True:
             out = [(toTS(ts), v) for ts, v in out]
         return list(reversed(out))
@@ -470,7 +907,7 @@ class Animal(APIObject, DataMixin, EventMixin):
         if not self._heats:
             self._heats = [Heat.create_from_data(api=self.api, data=h, timezone=self.timezone)
                            for h in self.data["heats"]]
-            self._heats.sort(key=lambda x: x.date)
+            self._heats.sort(key=lambda x: x.data["heat_date"])
         return self._heats
 
     @property
@@ -478,7 +915,7 @@ class Animal(APIObject, DataMixin, EventMixin):
         if not self._lactations:
             self._lactations = [Lactation.create_from_data(api=self.api, data=h, timezone=self.timezone)
                                 for h in self.data["lactations"]]
-            self._lactations.sort(key=lambda x: x.date)
+            self._lactations.sort(key=lambda x: x.data["calving_date"])
         return self._lactations
 
     @property
@@ -489,6 +926,8 @@ class Animal(APIObject, DataMixin, EventMixin):
 
 
 class Annotation(APIObject):
+    __slots__ = ()
+
     def __init__(self, api, _id):
         super(Annotation, self).__init__(api, _id)
 
@@ -517,6 +956,8 @@ class Annotation(APIObject):
 
 
 class TestSet(APIObject):
+    __slots__ = ()
+
     def __init__(self, api, _id):
         super(TestSet, self).__init__(api, _id)
 
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+# coding: utf8
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import HDict
+
+
+class Paginator(object):
+    """Lazy iterator over the results of an offset paginated endpoint.
+
+    fetch is called with the params of one page and has to return the
+    decoded response ({"data": [...], "pagination": {"next_offset": ..}}).
+    With prefetch enabled page N+1 is requested in the background while
+    the caller is still working on page N.
+    """
+    def __init__(self, fetch, params, page_size=100, prefetch=True):
+        self.fetch = fetch
+        self.params = HDict(params)
+        self.params["limit"] = page_size
+        if self.params.get("offset") is None:
+            self.params["offset"] = 0
+        self.page_size = page_size
+        self.prefetch = prefetch
+
+    def _get_page(self, offset):
+        params = HDict(self.params)
+        params["offset"] = offset
+        return self.fetch(params)
+
+    def pages(self):
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            res = self._get_page(self.params["offset"])
+            while True:
+                data = res["data"]
+                if len(data) < self.page_size:
+                    yield data
+                    break
+                offset = res["pagination"]["next_offset"]
+                next_page = None
+                if executor is not None:
+                    next_page = executor.submit(self._get_page, offset)
+                yield data
+                if next_page is not None:
+                    res = next_page.result()
+                else:
+                    res = self._get_page(offset)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def __iter__(self):
+        for page in self.pages():
+            for item in page:
+                yield item
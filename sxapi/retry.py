@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# coding: utf8
+
+import time
+import random
+import threading
+import email.utils
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) to seconds from now.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class RetryPolicy(object):
+    # PUT is idempotent by definition but creates events and sensordata
+    # in this API, so only the safe verbs are retried by default
+    DEFAULT_METHODS = frozenset(["get", "head", "options", "delete"])
+    DEFAULT_STATUS = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=60.0, status_forcelist=None,
+                 methods=None, respect_retry_after=True, jitter=True):
+        """Retry configuration for BaseAPI.
+
+        The wait before retry n (starting at 0) is backoff_factor * 2 ** n,
+        capped at max_backoff. With jitter a random value between 0 and that
+        wait is used so parallel clients do not retry in lockstep. A
+        Retry-After header given by the server takes precedence.
+        """
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_forcelist = frozenset(status_forcelist or self.DEFAULT_STATUS)
+        self.methods = frozenset(m.lower() for m in (methods or self.DEFAULT_METHODS))
+        self.respect_retry_after = respect_retry_after
+        self.jitter = jitter
+
+    def can_retry(self, method, attempt):
+        return attempt < self.total and method.lower() in self.methods
+
+    def should_retry(self, method, status_code, attempt):
+        return status_code in self.status_forcelist and self.can_retry(method, attempt)
+
+    def backoff(self, attempt, retry_after=None):
+        if self.respect_retry_after:
+            wait = parse_retry_after(retry_after)
+            if wait is not None:
+                return min(wait, self.max_backoff)
+        wait = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+        if self.jitter:
+            wait = random.uniform(0, wait)
+        return wait
+
+
+class RateLimiter(object):
+    def __init__(self, rate, burst=None):
+        """Token bucket allowing rate requests per second on average.
+
+        burst is the bucket size (default: rate). One instance can be shared
+        by several API clients and threads.
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
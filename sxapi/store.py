@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# coding: utf8
+
+import time
+import sqlite3
+import threading
+
+
+class SensordataStore(object):
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS points (
+               kind TEXT, id TEXT, metric TEXT, ts INTEGER, value REAL,
+               PRIMARY KEY (kind, id, metric, ts)) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS ranges (
+               kind TEXT, id TEXT, metric TEXT, from_ts INTEGER, to_ts INTEGER)""",
+        """CREATE INDEX IF NOT EXISTS ranges_key ON ranges (kind, id, metric)""",
+    ]
+
+    def __init__(self, path=":memory:", align=24 * 60 * 60, horizon=2 * 60 * 60):
+        """Local SQLite store for sensordata keyed by (animal/device, metric).
+
+        The store remembers which time ranges it already holds and only the
+        gaps are fetched from the API. Requested ranges are widened to
+        multiples of align seconds so rolling windows hit the same blocks.
+        Data younger than horizon seconds is stored but not marked as
+        complete, so it is fetched again on the next request.
+        """
+        self.path = path
+        self.align = align
+        self.horizon = horizon
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            for statement in self.SCHEMA:
+                self._db.execute(statement)
+
+    def close(self):
+        self._db.close()
+
+    def ranges(self, kind, _id, metric):
+        with self._lock:
+            cur = self._db.execute("SELECT from_ts, to_ts FROM ranges WHERE kind=? AND id=? AND metric=? "
+                                   "ORDER BY from_ts", (kind, _id, metric))
+            return cur.fetchall()
+
+    def missing(self, kind, _id, metric, from_ts, to_ts):
+        """Aligned gaps of [from_ts, to_ts] (inclusive) not held by the store.
+        """
+        f = from_ts - from_ts % self.align
+        t = to_ts - to_ts % self.align + self.align - 1
+        gaps = []
+        for r_from, r_to in self.ranges(kind, _id, metric):
+            if r_to < f:
+                continue
+            if r_from > t:
+                break
+            if r_from > f:
+                gaps.append((f, r_from - 1))
+            f = max(f, r_to + 1)
+        if f <= t:
+            gaps.append((f, t))
+        return gaps
+
+    def get(self, kind, _id, metric, from_ts, to_ts):
+        with self._lock:
+            cur = self._db.execute("SELECT ts, value FROM points WHERE kind=? AND id=? AND metric=? "
+                                   "AND ts >= ? AND ts <= ? ORDER BY ts",
+                                   (kind, _id, metric, from_ts, to_ts))
+            return [list(x) for x in cur]
+
+    def put(self, kind, _id, metric, from_ts, to_ts, data):
+        """Store the data fetched for [from_ts, to_ts].
+        """
+        complete_to = min(to_ts, int(time.time() - self.horizon))
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?)",
+                                 ((kind, _id, metric, int(ts), value) for ts, value in data))
+            if complete_to >= from_ts:
+                self._add_range(kind, _id, metric, from_ts, complete_to)
+
+    def _add_range(self, kind, _id, metric, from_ts, to_ts):
+        cur = self._db.execute("SELECT from_ts, to_ts FROM ranges WHERE kind=? AND id=? AND metric=? "
+                               "AND to_ts >= ? AND from_ts <= ?",
+                               (kind, _id, metric, from_ts - 1, to_ts + 1))
+        for r_from, r_to in cur.fetchall():
+            from_ts = min(from_ts, r_from)
+            to_ts = max(to_ts, r_to)
+        self._db.execute("DELETE FROM ranges WHERE kind=? AND id=? AND metric=? AND to_ts >= ? AND from_ts <= ?",
+                         (kind, _id, metric, from_ts - 1, to_ts + 1))
+        self._db.execute("INSERT INTO ranges VALUES (?, ?, ?, ?, ?)", (kind, _id, metric, from_ts, to_ts))
+
+    def fetch(self, kind, _id, metric, from_ts, to_ts, fetch):
+        """Return the data of [from_ts, to_ts], calling fetch(f, t) for the gaps.
+        """
+        for f, t in self.missing(kind, _id, metric, from_ts, to_ts):
+            self.put(kind, _id, metric, f, t, fetch(f, t))
+        return self.get(kind, _id, metric, from_ts, to_ts)
+
+    def invalidate(self, kind=None, _id=None, metric=None):
+        where = []
+        args = []
+        for column, value in (("kind", kind), ("id", _id), ("metric", metric)):
+            if value is not None:
+                where.append("{}=?".format(column))
+                args.append(value)
+        clause = " WHERE " + " AND ".join(where) if where else ""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM points" + clause, args)
+            self._db.execute("DELETE FROM ranges" + clause, args)
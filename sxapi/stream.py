@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# coding: utf8
+
+import json
+import codecs
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+WHITESPACE = " \t\n\r"
+DELIMITERS = WHITESPACE + ",:]}"
+
+
+class JSONArrayStream(object):
+    """Incremental decoder for the elements of a JSON array.
+
+    chunks is an iterable of bytes or text (e.g. Response.iter_content).
+    If key is given the document has to be an object and the array stored
+    under key is streamed, otherwise the document itself has to be an
+    array. Only one element is decoded at a time, the rest of the document
+    is never held in memory as Python objects.
+    """
+    COMPACT_SIZE = 64 * 1024
+
+    def __init__(self, chunks, key=None):
+        self.chunks = iter(chunks)
+        self.key = key
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        if self.eof:
+            return False
+        if self.pos > self.COMPACT_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buf += self.text_decoder.decode(b"", final=True)
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk)
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return None
+
+    def _expect(self, char):
+        c = self._peek()
+        if c != char:
+            raise ValueError("invalid JSON: expected {!r} at {} got {!r}".format(char, self.pos, c))
+        self.pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self._more():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            truncated = end == len(self.buf) or self.buf[end] not in DELIMITERS
+            if truncated and not self.eof and self._more():
+                continue
+            self.pos = end
+            return obj
+
+    def _seek_key(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return False
+        while True:
+            k = self._value()
+            self._expect(":")
+            if k == self.key:
+                return True
+            self._value()
+            c = self._peek()
+            if c == "}":
+                return False
+            self._expect(",")
+
+    def __iter__(self):
+        if self.key is not None and not self._seek_key():
+            return
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == "]":
+                self.pos += 1
+                return
+            self._expect(",")
+
+
+def iter_json_array(chunks, key=None):
+    return iter(JSONArrayStream(chunks, key=key))
+
+
+def collect_arrays(pairs):
+    """Collect (ts, value) pairs into an int64 and a double array.
+
+    Missing values (null) are stored as NaN. A decoded list is converted
+    with numpy (if installed), other iterables point by point.
+    """
+    if np is not None and isinstance(pairs, list) and pairs:
+        try:
+            points = np.array(pairs, dtype=np.float64)
+        except (TypeError, ValueError):
+            points = None
+        if points is not None and points.ndim == 2 and points.shape[1] == 2:
+            ts = array("q")
+            ts.frombytes(points[:, 0].astype(np.int64).tobytes())
+            values = array("d")
+            values.frombytes(np.ascontiguousarray(points[:, 1]).tobytes())
+            return ts, values
+    ts = array("q")
+    values = array("d")
+    for t, v in pairs:
+        ts.append(int(t))
+        values.append(float("nan") if v is None else v)
+    return ts, values
@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# coding: utf8
+
+import time
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from .bulk import BulkUploadError, to_points, is_points
+
+
+class BufferFullError(Exception):
+    pass
+
+
+class BufferedWriter(object):
+    def __init__(self, api, max_points=10000, flush_interval=5.0, max_buffer=100000,
+                 max_workers=4, on_error=None):
+        """Write-behind buffer for the sensordata and events of a LowLevelInternAPI.
+
+        Points are collected per (device_id, metric) and sent by a
+        background thread with insertSensorDataBulk as soon as max_points
+        points and events are buffered or flush_interval seconds passed.
+        Events are sent with insertEvent (up to max_workers at once).
+
+        Inserts block while max_buffer points and events are waiting to be
+        written. Failed writes are passed to on_error(exception, sensordata,
+        events), the default logs them. close() writes everything left.
+        """
+        self.api = api
+        self.max_points = max_points
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_workers = max_workers
+        self.on_error = on_error or self._log_error
+        self.written_points = 0
+        self.written_events = 0
+        self.errors = 0
+        self._points = collections.OrderedDict()
+        self._events = []
+        self._buffered = 0
+        self._inflight = 0
+        self._rounds = 0
+        self._done = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="sxapi-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def _log_error(e, sensordata, events):
+        logging.error("writing %s series and %s events failed: %s", len(sensordata), len(events), e)
+
+    def _wait_for_room(self, n, timeout):
+        if self._closed:
+            raise ValueError("writer is closed")
+        deadline = None if timeout is None else time.time() + timeout
+        # an insert larger than max_buffer is accepted once the buffer is empty
+        while self._buffered + self._inflight > 0 and self._buffered + self._inflight + n > self.max_buffer:
+            self._flush_requested = True
+            self._cond.notify_all()
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise BufferFullError("{} points and events waiting".format(self._buffered + self._inflight))
+            self._cond.wait(remaining)
+            if self._closed:
+                raise ValueError("writer is closed")
+
+    def _added(self, n):
+        self._buffered += n
+        if self._buffered >= self.max_points:
+            self._cond.notify_all()
+
+    def insertSensorData(self, device_id, metric, data, timeout=None):
+        data = to_points(data, metric)
+        if is_points(data):
+            data = data.tolist()
+        with self._cond:
+            self._wait_for_room(len(data), timeout)
+            self._points.setdefault((device_id, metric), []).extend(data)
+            self._added(len(data))
+
+    def insertEvent(self, device_id, event_type, timestamp, value, metadata,
+                    level=10, disable_notifications=False, timeout=None):
+        event = {"device_id": device_id, "event_type": event_type, "timestamp": timestamp,
+                 "value": value, "metadata": dict(metadata), "level": level,
+                 "disable_notifications": disable_notifications}
+        with self._cond:
+            self._wait_for_room(1, timeout)
+            self._events.append(event)
+            self._added(1)
+
+    def flush(self, timeout=None):
+        """Write everything buffered so far and wait until it is written.
+        """
+        with self._cond:
+            target = self._rounds + 1
+            self._flush_requested = True
+            self._cond.notify_all()
+            deadline = None if timeout is None else time.time() + timeout
+            while self._done < target and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.time() + self.flush_interval
+                while not (self._closed or self._flush_requested or self._buffered >= self.max_points):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                points, events = self._points, self._events
+                self._points, self._events = collections.OrderedDict(), []
+                self._inflight, self._buffered = self._buffered, 0
+                self._flush_requested = False
+                self._rounds += 1
+                closed = self._closed
+            try:
+                self._write(points, events)
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    self._done += 1
+                    self._cond.notify_all()
+            if closed:
+                return
+
+    def _write(self, points, events):
+        if points:
+            sensordata = [{"device_id": d, "metric": m, "data": data} for (d, m), data in points.items()]
+            try:
+                self.api.insertSensorDataBulk(sensordata)
+            except BulkUploadError as e:
+                self._error(e, [s for c in e.failed for s in c.sensordata], [])
+                self.written_points += sum(c.points for c in e.chunks if c.ok)
+            except Exception as e:
+                self._error(e, sensordata, [])
+            else:
+                self.written_points += sum(len(s["data"]) for s in sensordata)
+        if len(events) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(events))) as executor:
+                list(executor.map(self._write_event, events))
+        else:
+            for event in events:
+                self._write_event(event)
+
+    def _write_event(self, event):
+        try:
+            self.api.insertEvent(**event)
+        except Exception as e:
+            self._error(e, [], [event])
+        else:
+            with self._cond:
+                self.written_events += 1
+
+    def _error(self, e, sensordata, events):
+        with self._cond:
+            self.errors += 1
+        try:
+            self.on_error(e, sensordata, events)
+        except Exception:
+            logging.exception("writer error callback failed")
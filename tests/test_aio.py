@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import asyncio
+import json
+import mock
+
+from sxapi import AsyncLowLevelAPI
+
+
+class FakeResponse(object):
+    def __init__(self, data, status=200):
+        self.data = data
+        self.status = status
+        self.reason = "OK"
+        self.content_length = None
+
+    async def read(self):
+        return json.dumps(self.data).encode("utf-8")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return FakeResponse(self.responses.pop(0))
+
+
+class AsyncApiTests(unittest.TestCase):
+    INTERN_ENDPOINT = "http://0.0.0.0:8787/internapi/v0"
+    PUBLIC_ENDPOINT = "http://0.0.0.0:8989/publicapi/v1"
+    API_KEY = "abcd"
+
+    def run_with_session(self, session, coro_fn):
+        async def runner():
+            api = AsyncLowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                                   api_key=self.API_KEY)
+            for low in (api.publiclow, api.privatelow):
+                low._semaphore = asyncio.Semaphore(2)
+            with mock.patch('sxapi.aio.AsyncBaseAPI.get_session', return_value=session):
+                return await coro_fn(api)
+        return asyncio.run(runner())
+
+    def test_status(self):
+        session = FakeSession([{"status": "ok"}])
+        r = self.run_with_session(session, lambda api: api.get_public_status())
+        self.assertEqual(r, {"status": "ok"})
+        self.assertEqual(session.calls[0][0], "GET")
+        self.assertEqual(session.calls[0][1], "http://0.0.0.0:8989/publicapi/v1/service/status")
+
+    def test_pagination(self):
+        page1 = {"data": [{"_id": i} for i in range(100)], "pagination": {"next_offset": 100}}
+        page2 = {"data": [{"_id": 100}], "pagination": {"next_offset": 200}}
+        session = FakeSession([page1, page2])
+        r = self.run_with_session(session, lambda api: api.get_animal_events("abcd", 10, 20))
+        self.assertEqual(len(r), 101)
+        self.assertIn(("offset", "100"), session.calls[1][2]["params"])
+
+    def test_params_encoding(self):
+        session = FakeSession([[{"metric": "ph"}]])
+        self.run_with_session(session, lambda api: api.getSensorData("1234567890", "ph", 10, 20))
+        self.assertTrue(session.calls[0][1].endswith("sensordatabulk"))
+        params = session.calls[0][2]["params"]
+        self.assertIn(("metrics", "ph"), params)
+        self.assertIn(("device_id", "1234567890"), params)
+
+    def test_gather(self):
+        session = FakeSession([{"_id": "a"}, {"_id": "b"}, {"_id": "c"}])
+
+        async def fetch(api):
+            return await asyncio.gather(*[api.get_animal_by_id(x) for x in ("a", "b", "c")])
+        r = self.run_with_session(session, fetch)
+        self.assertEqual(len(r), 3)
+        self.assertEqual(len(session.calls), 3)
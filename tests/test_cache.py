@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import shutil
+import tempfile
+import mock
+
+from sxapi import LowLevelAPI, ResponseCache
+from sxapi.cache import CacheEntry
+from tests.test_lowapi import FakeResponse
+
+
+class CacheTests(unittest.TestCase):
+    PUBLIC_ENDPOINT = "http://0.0.0.0:8989/publicapi/v1"
+    API_KEY = "abcd"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_eviction(self):
+        cache = ResponseCache(max_size=10, ttl=60)
+        cache.set("a", CacheEntry(b"12345", etag="1"))
+        cache.set("b", CacheEntry(b"12345", etag="2"))
+        cache.get("a")
+        cache.set("c", CacheEntry(b"123", etag="3"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a").etag, "1")
+        self.assertEqual(cache.size, 8)
+        with mock.patch("time.time", return_value=cache.get("a").stored_at + 61):
+            self.assertIsNone(cache.get("a"))
+
+    def test_disk(self):
+        cache = ResponseCache(directory=self.directory, max_disk_size=10)
+        cache.set("a", CacheEntry(b"123456", last_modified="Wed, 21 Oct 2015 07:28:00 GMT"))
+        entry = ResponseCache(directory=self.directory).get("a")
+        self.assertEqual(entry.body, b"123456")
+        self.assertEqual(entry.validators(), {"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        os.utime(cache._paths("a")[1], (0, 0))
+        cache.set("b", CacheEntry(b"123456"))
+        self.assertIsNone(ResponseCache(directory=self.directory).get("a"))
+
+    def test_conditional_get(self):
+        sxapi = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, api_key=self.API_KEY,
+                            cache=ResponseCache())
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = [FakeResponse({"_id": "abcd", "name": "Berta"},
+                                                            headers={"ETag": '"v1"'}),
+                                               FakeResponse(None, 304, headers={"Content-Length": "0"})]
+            self.assertEqual(sxapi.get_animal_by_id("abcd")["name"], "Berta")
+            self.assertEqual(sxapi.get_animal_by_id("abcd")["name"], "Berta")
+            call = patched_session.get.call_args_list
+            self.assertNotIn("headers", call[0][1])
+            self.assertEqual(call[1][1]["headers"]["If-None-Match"], '"v1"')
+            self.assertEqual(call[1][1]["params"]["animal_id"], "abcd")
+
+    def test_lookup_cache(self):
+        def answer(url, headers=None, **kwargs):
+            if headers and headers.get("If-None-Match") == '"1"':
+                return FakeResponse(None, 304, headers={"Content-Length": "0"})
+            return FakeResponse({"_id": "d", "name": "a"}, headers={"ETag": '"1"'})
+
+        for kwargs, requests in (({}, 2), ({"cache_lookups": True}, 1),
+                                 ({"cache_lookups": True, "cache": ResponseCache()}, 2)):
+            sxapi = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, api_key=self.API_KEY, **kwargs)
+            with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+                patched_session.get.side_effect = answer
+                device = sxapi.publiclow.get_device_by_id("d")
+                device["name"] = "changed"
+                self.assertEqual(sxapi.publiclow.get_device_by_id("d")["name"], "a")
+                self.assertEqual(patched_session.get.call_count, requests, kwargs)
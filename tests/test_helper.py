@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import mock
+
+import numpy as np
+
+from sxapi.helper import cached, fromTS, toTS, fromTS_array, toTS_array
+
+
+class Lookup(object):
+    def __init__(self):
+        self.calls = 0
+
+    @cached(maxsize=2, ttl=60)
+    def get(self, key, extra=None):
+        self.calls += 1
+        return (key, extra)
+
+
+class CachedTests(unittest.TestCase):
+    def test_per_instance(self):
+        a, b = Lookup(), Lookup()
+        self.assertEqual(a.get(1), (1, None))
+        self.assertEqual(a.get(1), (1, None))
+        self.assertEqual(b.get(1), (1, None))
+        self.assertEqual((a.calls, b.calls), (1, 1))
+        self.assertEqual(a.get.cache_info()["hits"], 1)
+
+    def test_kwargs_and_unhashable(self):
+        a = Lookup()
+        a.get(1, extra=2)
+        a.get(1, extra=2)
+        a.get(1, extra=3)
+        self.assertEqual(a.calls, 2)
+        a.get([1])
+        a.get([1])
+        self.assertEqual(a.calls, 4)
+
+    def test_eviction_ttl_invalidate(self):
+        a = Lookup()
+        a.get(1)
+        a.get(2)
+        a.get(1)
+        a.get(3)
+        self.assertEqual(a.calls, 3)
+        a.get(1)
+        self.assertEqual(a.calls, 3)
+        a.get(2)
+        self.assertEqual(a.calls, 4)
+        a.get.invalidate(2)
+        a.get(2)
+        self.assertEqual(a.calls, 5)
+        with mock.patch("time.time", return_value=10 ** 10):
+            a.get(2)
+        self.assertEqual(a.calls, 6)
+        a.get.cache_clear()
+        self.assertEqual(a.get.cache_info()["size"], 0)
+
+
+class ArrayTSTests(unittest.TestCase):
+    # midnight, a time in the skipped and one in the repeated hour (Vienna)
+    TS = [1514764800, 1521945000, 1540690200, 1700000000]
+
+    def test_fromTS_array(self):
+        index = fromTS_array(self.TS, "Europe/Vienna")
+        self.assertEqual([x.isoformat() for x in index],
+                         [fromTS(x, "Europe/Vienna").isoformat() for x in self.TS])
+        naive = fromTS_array(self.TS, tz_aware=False)
+        self.assertEqual(naive.tolist(), [fromTS(x, tz_aware=False) for x in self.TS])
+
+    def test_toTS_array(self):
+        index = fromTS_array(self.TS, "America/New_York")
+        expected = [toTS(fromTS(x, "America/New_York")) for x in self.TS]
+        self.assertEqual(toTS_array(index).tolist(), expected)
+        self.assertEqual(toTS_array(fromTS_array(self.TS, tz_aware=False)).tolist(), self.TS)
+        self.assertEqual(toTS_array(np.array(self.TS, dtype=float)).tolist(), self.TS)
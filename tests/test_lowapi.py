@@ -3,9 +3,38 @@
 
 import unittest
 import time
+import json
+import gzip
 import mock
+from concurrent.futures import ThreadPoolExecutor
 
-from sxapi import LowLevelAPI
+from requests.exceptions import ConnectionError, HTTPError
+
+from sxapi import LowLevelAPI, BulkUploadError
+from sxapi.low import LowLevelPublicAPI
+from sxapi.bulk import to_points, Points
+from sxapi import codec
+
+
+class FakeResponse(object):
+    def __init__(self, data, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    @property
+    def content(self):
+        return json.dumps(self.data).encode("utf-8")
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
 
 
 class LowApiTests(unittest.TestCase):
@@ -270,3 +299,269 @@ class LowApiTests(unittest.TestCase):
             sxapi.query_organisations()
             call = patched_session.get.call_args_list
             self.assertEqual(call[0][0][0], "http://0.0.0.0:8787/internapi/v1/organisation/list")
+
+    def test_sensordata_windows(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY, max_workers=4)
+
+        def answer(url, params=None, **kwargs):
+            time.sleep(0.01 * (10 - params["from_date"] // (100 * 24 * 60 * 60)))
+            return FakeResponse({"data": [[params["from_date"], 1.0], [params["to_date"], 2.0]]})
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            data = sxapi.get_animal_sensordata("myanimal", "temp", 0, 730 * 24 * 60 * 60)
+            self.assertEqual(len(patched_session.get.call_args_list), 8)
+            self.assertEqual([x[0] for x in data], sorted(x[0] for x in data))
+            self.assertEqual(data[0][0], 0)
+            self.assertEqual(data[-1][0], 730 * 24 * 60 * 60)
+
+    def test_pagination(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY)
+
+        def answer(url, params=None, **kwargs):
+            offset = params["offset"]
+            n = 0 if offset >= 120 else params["limit"]
+            return FakeResponse({"data": [{"_id": offset + i} for i in range(n)],
+                                 "pagination": {"next_offset": offset + n}})
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            events = sxapi.iter_events_by_organisation("my_org_id", 1480773600, 1480773610, page_size=40)
+            self.assertEqual([x["_id"] for x in events], list(range(120)))
+            call = patched_session.get.call_args_list
+            self.assertEqual(len(call), 4)
+            self.assertEqual([x[1]["params"]["offset"] for x in call], [0, 40, 80, 120])
+            self.assertEqual(call[0][1]["params"]["limit"], 40)
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            self.assertEqual(len(sxapi.query_users()), 200)
+            call = patched_session.get.call_args_list
+            self.assertEqual(call[0][0][0], "http://0.0.0.0:8787/internapi/v1/user/list")
+
+    def test_threadsafe_login(self):
+        api = LowLevelPublicAPI(email="myuser@smaxtec.com", password="mypassword",
+                                endpoint=self.PUBLIC_ENDPOINT, pool_maxsize=32, coalesce=False)
+
+        def answer(url, params=None, **kwargs):
+            if url.endswith("get_token"):
+                time.sleep(0.05)
+                return FakeResponse({"token": "mytoken"})
+            return FakeResponse({"status": "ok"})
+
+        with mock.patch('requests.Session') as patched_session:
+            patched_session.return_value.get.side_effect = answer
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                res = list(executor.map(lambda x: api.get_status(), range(64)))
+            self.assertEqual(len(res), 64)
+            self.assertEqual(patched_session.call_count, 1)
+            urls = [x[0][0] for x in patched_session.return_value.get.call_args_list]
+            self.assertEqual(len([x for x in urls if x.endswith("get_token")]), 1)
+            self.assertEqual(api.counter, 64)
+            adapter = patched_session.return_value.mount.call_args_list[0][0][1]
+            self.assertEqual(adapter._pool_maxsize, 32)
+
+    def test_compressed_bulk(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY, compress_requests=True, compress_min_size=100)
+        small = {"device_id": "1234567890", "metric": "ph", "data": [(1480773600, 2.0)]}
+        large = {"device_id": "1234567890", "metric": "ph",
+                 "data": [(1480773600 + i, 2.0) for i in range(100)]}
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.put.return_value = FakeResponse([{"ok": True}])
+            sxapi.insertSensorDataBulk([small])
+            sxapi.insertSensorDataBulk([large])
+            call = patched_session.put.call_args_list
+            self.assertNotIn("json", call[0][1])
+            self.assertNotIn("Content-Encoding", call[0][1]["headers"])
+            self.assertEqual(json.loads(call[0][1]["data"])["sensordata"][0]["data"], [[1480773600, 2.0]])
+            self.assertEqual(call[1][1]["headers"]["Content-Encoding"], "gzip")
+            body = json.loads(gzip.decompress(call[1][1]["data"]))
+            self.assertEqual(len(body["sensordata"][0]["data"]), 100)
+        self.assertIn("gzip", sxapi.publiclow._create_session().headers["Accept-Encoding"])
+
+    def test_metrics(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY)
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = [FakeResponse({"_id": "abcd"})] * 150 + \
+                [FakeResponse({"message": "not found"}, 404)]
+            for _ in range(150):
+                sxapi.get_animal_by_id("abcd")
+            with self.assertRaises(Exception):
+                sxapi.get_animal_by_id("unknown")
+        low = sxapi.publiclow
+        self.assertEqual(low.counter, 151)
+        self.assertEqual(len(low.requests), 100)
+        self.assertEqual(len(low.stats()), 101)
+        snap = low.metrics.snapshot()
+        e = snap["endpoints"]["GET /animal/by_id"]
+        self.assertEqual(e["count"], 151)
+        self.assertEqual(e["status"], {200: 150, 404: 1})
+        self.assertEqual(e["errors"], 1)
+        self.assertEqual(e["bytes_in"], 150 * len(b'{"_id": "abcd"}') + len(b'{"message": "not found"}'))
+        self.assertTrue(e["p50"] <= e["p95"] <= e["p99"])
+        text = low.metrics.to_prometheus()
+        self.assertIn('sxapi_request_duration_seconds_count{method="GET",path="/animal/by_id"} 151', text)
+        self.assertIn('sxapi_responses_total{method="GET",path="/animal/by_id",status="404"} 1', text)
+
+    def test_hooks(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY)
+        seen = []
+        sxapi.add_hook("before_request", lambda info: seen.append(("before", info["path"])))
+        sxapi.add_hook("after_response", lambda info: seen.append(("after", dict(info))))
+        sxapi.add_hook("error", lambda info: seen.append(("error", info["error"])))
+        sxapi.add_hook("after_response", lambda info: 1 / 0)
+        with self.assertRaises(ValueError):
+            sxapi.add_hook("foo", lambda info: None)
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = [FakeResponse({"_id": "abcd"}),
+                                               FakeResponse({"message": "not found"}, 404)]
+            sxapi.get_animal_by_id("abcd")
+            with self.assertRaises(Exception):
+                sxapi.getSensorInfo("1234567890")
+        self.assertEqual(seen[0], ("before", "/animal/by_id"))
+        info = seen[1][1]
+        self.assertEqual(info["status"], 200)
+        self.assertEqual(info["params_size"], 1)
+        self.assertEqual(info["response_size"], len(b'{"_id": "abcd"}'))
+        self.assertTrue(info["elapsed"] >= 0 and info["decode_time"] >= 0)
+        self.assertEqual(seen[2], ("before", "/sensorinfo"))
+        self.assertEqual(seen[3][0], "error")
+        self.assertEqual(len(seen), 4)
+
+    def test_coalesce(self):
+        sxapi = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, api_key=self.API_KEY)
+
+        def answer(url, params=None, **kwargs):
+            time.sleep(0.2)
+            return FakeResponse({"_id": params["animal_id"]})
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                res = list(executor.map(lambda x: sxapi.get_animal_by_id("abcd"), range(8)))
+            self.assertEqual(res, [{"_id": "abcd"}] * 8)
+            self.assertEqual(patched_session.get.call_count, 1)
+            sxapi.publiclow.get("/animal/by_id", params={"animal_id": "abcd"})
+            sxapi.get_animal_by_id("abcd")
+            self.assertEqual(patched_session.get.call_count, 3)
+
+    def test_eager_organisation(self):
+        def answer(url, params=None, **kwargs):
+            if url.endswith("/organisation/by_id"):
+                return FakeResponse({"_id": "org", "timezone": "Europe/Vienna", "devices": ["d1", "d2"]})
+            if url.endswith("/animal/ids_by_organisation"):
+                return FakeResponse([{"_id": "a1"}, {"_id": "a2"}, {"_id": "a3"}])
+            if url.endswith("/animallist"):
+                return FakeResponse([{"_id": "a1"}, {"_id": "a2"}, {"_id": "a3"}])
+            key = "animal_id" if "animal_id" in params else "device_id"
+            return FakeResponse({"_id": params[key], "name": params[key]})
+
+        public = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, api_key=self.API_KEY)
+        intern = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, private_endpoint=self.INTERN_ENDPOINT,
+                             api_key=self.API_KEY)
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            org = public.get_organisation_object("org", eager=True)
+            self.assertEqual([a.name for a in org.animals], ["a1", "a2", "a3"])
+            self.assertEqual([d.name for d in org.devices], ["d1", "d2"])
+            self.assertEqual(org.animals[0].timezone, "Europe/Vienna")
+            self.assertEqual(patched_session.get.call_count, 7)
+
+            patched_session.get.reset_mock()
+            org = intern.get_organisation_object("org", eager=True)
+            self.assertEqual([a._id for a in org.animals], ["a1", "a2", "a3"])
+            urls = [x[0][0] for x in patched_session.get.call_args_list]
+            self.assertEqual(urls, [self.PUBLIC_ENDPOINT + "/organisation/by_id",
+                                    self.INTERN_ENDPOINT + "/animallist"])
+
+    def test_chunked_bulk(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY)
+        sensordata = [{"device_id": "1234567890", "metric": "ph",
+                       "data": [(1480773600 + i, 2.0) for i in range(25)]},
+                      {"device_id": "1234567890", "metric": "temp",
+                       "data": [(1480773600 + i, 38.0) for i in range(5)]}]
+        failures = [ConnectionError("reset")]
+
+        def answer(url, json=None, **kwargs):
+            if len(json["sensordata"]) == 2 and failures:
+                raise failures.pop()
+            return FakeResponse([{"points": len(s["data"])} for s in json["sensordata"]])
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session, mock.patch('time.sleep'):
+            patched_session.put.side_effect = answer
+            chunks = sxapi.uploadSensorDataBulk(sensordata, max_points=10, max_workers=3)
+            self.assertEqual([c.points for c in chunks], [10, 10, 10])
+            self.assertTrue(all(c.ok for c in chunks))
+            self.assertEqual([c.attempts for c in chunks], [1, 1, 2])
+            self.assertEqual(chunks[2].result, [{"points": 5}, {"points": 5}])
+            self.assertEqual(chunks[2].sensordata[1]["metric"], "temp")
+            self.assertEqual(patched_session.put.call_args_list[0][1]["timeout"], 25)
+
+            patched_session.put.side_effect = [FakeResponse([{"ok": True}]), FakeResponse({"message": "bad"}, 422)]
+            with self.assertRaises(BulkUploadError) as e:
+                sxapi.insertSensorDataBulk(sensordata, max_points=20, timeout=60)
+            self.assertEqual(len(e.exception.failed), 1)
+            self.assertEqual(e.exception.failed[0].attempts, 1)
+            self.assertEqual(patched_session.put.call_args_list[-1][1]["timeout"], 60)
+            self.assertIsInstance(e.exception.__cause__, HTTPError)
+
+            # handlers written before chunking still catch the errors
+            patched_session.put.side_effect = [FakeResponse([{"ok": True}]), FakeResponse({"message": "bad"}, 422)]
+            with self.assertRaises(HTTPError):
+                sxapi.insertSensorDataBulk(sensordata, max_points=20)
+            patched_session.put.side_effect = [FakeResponse({"message": "bad"}, 422)]
+            with self.assertRaises(HTTPError) as e:
+                sxapi.insertSensorData("1234567890", "ph", [(1480773600, 2.0)])
+            self.assertNotIsInstance(e.exception, BulkUploadError)
+
+    def test_bulk_arrays(self):
+        import numpy as np
+        import pandas as pd
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY)
+        ts = np.arange(1480773600, 1480773610)
+        values = np.linspace(0, 1, 10)
+        series = pd.Series(values, index=pd.to_datetime(ts, unit="s"))
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.put.return_value = FakeResponse([{"ok": True}])
+            sxapi.insertSensorDataBulk([{"device_id": "1234567890", "metric": "ph", "data": (ts, values)},
+                                        {"device_id": "1234567890", "metric": "temp", "data": series}])
+            call = patched_session.put.call_args_list[0][1]
+            self.assertNotIn("json", call)
+            body = json.loads(call["data"])["sensordata"]
+            self.assertEqual(body[0]["data"][3], [1480773603, values[3]])
+            self.assertIn(b"[1480773603,", call["data"])
+            self.assertTrue(all(isinstance(p[0], int) for s in body for p in s["data"]))
+            self.assertEqual(body[1]["data"], body[0]["data"])
+            points = to_points(np.array([[1480773600.0, 1.5], [-1, 2.0], [1480773602, 1e-7]]))
+            self.assertEqual(codec.dumps(points), b"[[1480773600,1.5],[-1,2.0],[1480773602,1e-7]]")
+            with mock.patch("sxapi.codec.NAME", "json"):
+                self.assertEqual(points.to_json(), b"[[1480773600,1.5],[-1,2.0],[1480773602,1e-7]]")
+            self.assertEqual(codec.dumps({"a": points[:0]}), b'{"a":[]}')
+
+            # the payload is written from the columns, no list per point
+            with mock.patch.object(Points, "tolist", side_effect=AssertionError("tolist")):
+                sxapi.insertSensorDataBulk([{"device_id": "1234567890", "metric": "ph", "data": (ts, values)}])
+            body = json.loads(patched_session.put.call_args_list[-1][1]["data"])["sensordata"]
+            self.assertEqual(body[0]["data"], [[int(t), v] for t, v in zip(ts, values)])
+
+            values[2] = np.nan
+            with self.assertRaises(ValueError):
+                sxapi.insertSensorDataBulk([{"device_id": "1234567890", "metric": "ph", "data": (ts, values)}])
+            with self.assertRaises(ValueError):
+                sxapi.insertSensorDataBulk([{"device_id": "1234567890", "metric": "ph",
+                                             "data": [(1480773600, "a")]}])
+            sxapi.insertSensorDataBulk([{"device_id": "1234567890", "metric": "ph", "data": (ts, values)},
+                                        {"device_id": "1234567890", "metric": "temp",
+                                         "data": [(1480773600, 1.0), (1480773601, float("inf"))]}],
+                                       drop_nan=True)
+            body = json.loads(patched_session.put.call_args_list[-1][1]["data"])["sensordata"]
+            self.assertEqual([len(s["data"]) for s in body], [9, 1])
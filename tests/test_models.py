@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest
+import pendulum
+import numpy as np
+
+from sxapi.low import LowLevelPublicAPI
+from sxapi.models import Animal, Event
+
+
+def make_animal(calvings, timezone="UTC"):
+    api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+    animal = Animal(api=api, _id="abcd")
+    animal._timezone = timezone
+    animal.load({"organisation_id": "org", "heats": [],
+                 "lactations": [{"_id": str(c), "calving_date": c} for c in calvings]})
+    return animal
+
+
+class ModelTests(unittest.TestCase):
+    JAN = 1514764800  # 2018-01-01
+    JUN = 1527811200  # 2018-06-01
+    DAY = 24 * 60 * 60
+
+    def test_dim(self):
+        animal = make_animal([self.JUN, self.JAN])
+        at = lambda ts: animal.to_dim(pendulum.from_timestamp(ts))
+        self.assertEqual(at(self.JUN - 12 * self.DAY), -12)
+        self.assertEqual(at(self.JUN - 22 * self.DAY), 129)
+        self.assertEqual(at(self.JAN - 12 * self.DAY), -12)
+        self.assertEqual(make_animal([self.JAN]).to_dim(pendulum.from_timestamp(self.JAN - 20 * self.DAY)), -14.5)
+        self.assertEqual(make_animal([]).to_dim(pendulum.from_timestamp(self.JAN)), -14.5)
+
+    def test_dim_range(self):
+        animal = make_animal([self.JAN], "Europe/Vienna")
+        start = pendulum.from_timestamp(self.JAN - 16 * self.DAY, "Europe/Vienna")
+        end = start.add(days=3)
+        res = animal.dim_range(start, end, interval=self.DAY, timestamp=True)
+        self.assertEqual([x[1] for x in res], [-14.5, -14.5, -14, -13])
+        self.assertEqual(res[0][0] - res[1][0], -self.DAY)
+        grid, dims = animal.dim_array(start, end, interval=self.DAY)
+        self.assertEqual(dims.tolist(), [-14.5, -14.5, -14, -13])
+        self.assertEqual(grid[-1], (self.JAN - 13 * self.DAY) * 10 ** 6)
+        self.assertEqual(animal.dim_series(start, end, interval=self.DAY).iloc[-1], -13)
+        self.assertEqual(len(animal.fast_dim_range(end, start)), 0)
+
+    def test_dim_without_numpy(self):
+        animal = make_animal([self.JUN, self.JAN], "Europe/Vienna")
+        start = pendulum.from_timestamp(self.JAN - 30 * self.DAY, "Europe/Vienna")
+        end = pendulum.from_timestamp(self.JUN + 30 * self.DAY, "Europe/Vienna")
+        for timestamp in (False, True):
+            expected = animal.dim_range(start, end, interval=6 * 60 * 60, timestamp=timestamp)
+            with mock.patch("sxapi.models.np", None):
+                self.assertEqual(animal.dim_range(start, end, interval=6 * 60 * 60, timestamp=timestamp), expected)
+            with mock.patch("sxapi.models.pd", None):
+                self.assertEqual(animal.to_dim(end), expected[-1][1])
+
+    def test_dim_matrix(self):
+        from sxapi.models import Organisation
+        animals = [make_animal([self.JUN, self.JAN], "Europe/Vienna"), make_animal([], "Europe/Vienna"),
+                   make_animal([self.JAN], "Europe/Vienna")]
+        start = pendulum.from_timestamp(self.JAN - 30 * self.DAY, "Europe/Vienna")
+        end = pendulum.from_timestamp(self.JUN + 30 * self.DAY, "Europe/Vienna")
+        org = Organisation(api=animals[0].api, _id="org")
+        for block_size in (None, 1, 5):
+            ids, grid, matrix = org.dim_matrix(start, end, animals=animals, block_size=block_size)
+            self.assertEqual(ids, ["abcd"] * 3)
+            self.assertEqual(matrix.shape, (3, len(grid)))
+            for animal, row in zip(animals, matrix):
+                g, dims = animal.dim_array(start, end)
+                self.assertEqual(g.tolist(), grid.tolist())
+                self.assertEqual(dims.tolist(), row.tolist())
+
+    def test_dim_matrix_bulk_loads(self):
+        from sxapi.models import Organisation
+        api = make_animal([]).api
+        org = Organisation(api=api, _id="org")
+        org.load({"_id": "org", "timezone": "UTC"})
+        org._animals = [Animal(api=api, _id="a1")]
+        docs = [{"_id": "a1", "organisation_id": "org", "lactations": [{"_id": "1", "calving_date": self.JAN}]}]
+        with mock.patch.object(api, "get_organisation_animals", return_value=docs) as bulk, \
+                mock.patch.object(api, "get_animal_by_id") as single:
+            ids, grid, matrix = org.dim_matrix(pendulum.from_timestamp(self.JAN),
+                                               pendulum.from_timestamp(self.JAN + self.DAY), interval=self.DAY)
+            self.assertEqual(bulk.call_count, 1)
+            self.assertEqual(single.call_count, 0)
+            org.dim_matrix(pendulum.from_timestamp(self.JAN), pendulum.from_timestamp(self.JAN + self.DAY))
+            self.assertEqual(bulk.call_count, 1)
+        self.assertEqual(ids, ["a1"])
+        self.assertEqual(matrix.tolist(), [[0, 1]])
+
+    def test_events(self):
+        animal = make_animal([])
+        raw = [{"_id": "2", "timestamp": self.JUN, "event_type": "heat", "metadata": {"x": 1}},
+               {"_id": "1", "timestamp": self.JAN, "event_type": "calving", "metadata": {"x": 2, "y": "a"}},
+               {"_id": "3", "timestamp": self.JUN, "event_type": "heat", "metadata": {}}]
+        events = animal.get_events(self.JAN, self.JUN)
+        with mock.patch.object(animal.api, "get_animal_events", return_value=raw) as get:
+            self.assertEqual(events.timestamps.tolist(), [self.JAN, self.JUN, self.JUN])
+            self.assertEqual(events._events, [None] * 3)
+            self.assertIsInstance(events[-1], Event)
+            self.assertEqual(events[-1]._id, "3")
+            self.assertEqual(events._events[:2], [None] * 2)
+            self.assertEqual([x._id for x in events], ["1", "2", "3"])
+            self.assertEqual(get.call_count, 1)
+        self.assertEqual(list(events.event_types.categories), ["calving", "heat"])
+        series = events.to_series()
+        self.assertEqual(series.tolist(), ["calving", "heat", "heat"])
+        self.assertEqual(str(series.index[0]), "2018-01-01 00:00:00")
+        frame = events.to_frame()
+        self.assertEqual(frame["_id"].tolist(), ["1", "2", "3"])
+        self.assertEqual(frame["metadata.x"].tolist()[:2], [2, 1])
+        self.assertEqual(frame["metadata.y"].tolist()[0], "a")
+        self.assertNotIn("timestamp", frame.columns)
+
+    def test_events_tz(self):
+        raw = [{"_id": "1", "timestamp": self.JAN, "event_type": "calving", "metadata": {}}]
+        for tz_aware, expected in ((True, "2017-12-31 23:00:00"), (False, "2018-01-01 00:00:00")):
+            animal = make_animal([], "Europe/Vienna")
+            animal.api.tz_aware = tz_aware
+            animal._tz_aware = tz_aware
+            events = animal.get_events(self.JAN, self.JUN)
+            with mock.patch.object(animal.api, "get_animal_events", return_value=raw):
+                date = events[0].date
+                self.assertEqual(str(events.to_series().index[0]), expected)
+            # same as the former index built from Event.date
+            self.assertEqual(str(np.array([date]).astype("datetime64[s]")[0]), expected.replace(" ", "T"))
+
+    def test_events_without_numpy(self):
+        raw = [{"_id": "2", "timestamp": self.JUN, "event_type": "heat"},
+               {"_id": "1", "timestamp": self.JAN, "event_type": "calving"}]
+        animal = make_animal([])
+        with mock.patch.object(animal.api, "get_animal_events", return_value=raw), \
+                mock.patch("sxapi.models.np", None), mock.patch("sxapi.models.pd", None):
+            events = animal.get_events(self.JAN, self.JUN)
+            self.assertEqual(len(events), 2)
+            self.assertEqual(events.timestamps, [self.JAN, self.JUN])
+            self.assertEqual([x._id for x in events.data], ["1", "2"])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import time
+import mock
+
+from requests.exceptions import HTTPError
+
+from sxapi import LowLevelAPI, RetryPolicy, RateLimiter
+from tests.test_lowapi import FakeResponse
+
+
+class RetryTests(unittest.TestCase):
+    INTERN_ENDPOINT = "http://0.0.0.0:8787/internapi/v0"
+    PUBLIC_ENDPOINT = "http://0.0.0.0:8989/publicapi/v1"
+    API_KEY = "abcd"
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1.0, max_backoff=5.0, jitter=False)
+        self.assertEqual(policy.backoff(0), 1.0)
+        self.assertEqual(policy.backoff(2), 4.0)
+        self.assertEqual(policy.backoff(5), 5.0)
+        self.assertEqual(policy.backoff(0, "3"), 3.0)
+        self.assertEqual(policy.backoff(0, "120"), 5.0)
+        jittered = RetryPolicy(backoff_factor=1.0).backoff(3)
+        self.assertTrue(0 <= jittered <= 8.0)
+        self.assertTrue(policy.should_retry("get", 503, 0))
+        self.assertFalse(policy.should_retry("put", 503, 0))
+        self.assertFalse(policy.should_retry("get", 404, 0))
+        self.assertFalse(policy.should_retry("get", 503, 3))
+
+    def test_retry_get(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY, retry=RetryPolicy(total=2))
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session, mock.patch('time.sleep') as sleep:
+            responses = [FakeResponse({}, 429, {"Retry-After": "2"}),
+                         FakeResponse({}, 503),
+                         FakeResponse({"status": "ok"})]
+            patched_session.get.side_effect = responses
+            self.assertEqual(sxapi.get_public_status(), {"status": "ok"})
+            # discarded responses give their connection back
+            self.assertEqual([r.closed for r in responses], [True, True, False])
+            self.assertEqual(len(patched_session.get.call_args_list), 3)
+            self.assertEqual(sleep.call_args_list[0][0][0], 2.0)
+            self.assertEqual(sxapi.publiclow.retry_counter, 2)
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session, mock.patch('time.sleep'):
+            patched_session.get.side_effect = [FakeResponse({"message": "slow down"}, 429)] * 3
+            with self.assertRaises(HTTPError):
+                sxapi.get_public_status()
+            self.assertEqual(len(patched_session.get.call_args_list), 3)
+
+    def test_no_retry_put(self):
+        sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                            api_key=self.API_KEY, retry=RetryPolicy())
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session, mock.patch('time.sleep'):
+            patched_session.put.side_effect = [FakeResponse({"message": "busy"}, 429)]
+            with self.assertRaises(HTTPError):
+                sxapi.insertEvent("1234567890", 101, 1480773600, 6.5, {})
+            self.assertEqual(len(patched_session.put.call_args_list), 1)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(rate=100, burst=5)
+        for _ in range(5):
+            self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        start = time.time()
+        limiter.acquire()
+        self.assertTrue(time.time() - start > 0.005)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import time
+import mock
+
+from sxapi import LowLevelAPI, SensordataStore
+from tests.test_lowapi import FakeResponse
+
+DAY = 24 * 60 * 60
+
+
+class StoreTests(unittest.TestCase):
+    PUBLIC_ENDPOINT = "http://0.0.0.0:8989/publicapi/v1"
+    API_KEY = "abcd"
+
+    def test_missing(self):
+        store = SensordataStore(horizon=0)
+        self.assertEqual(store.missing("animal", "a", "temp", 10, DAY + 10), [(0, 2 * DAY - 1)])
+        store.put("animal", "a", "temp", 0, DAY - 1, [])
+        store.put("animal", "a", "temp", 3 * DAY, 4 * DAY - 1, [])
+        self.assertEqual(store.missing("animal", "a", "temp", 10, 5 * DAY),
+                         [(DAY, 3 * DAY - 1), (4 * DAY, 6 * DAY - 1)])
+        store.put("animal", "a", "temp", DAY, 3 * DAY - 1, [])
+        self.assertEqual(store.ranges("animal", "a", "temp"), [(0, 4 * DAY - 1)])
+        self.assertEqual(store.missing("animal", "a", "temp", 10, 3 * DAY), [])
+        self.assertEqual(store.missing("device", "a", "temp", 10, 20), [(0, DAY - 1)])
+
+    def test_horizon(self):
+        store = SensordataStore(horizon=DAY)
+        now = int(time.time())
+        store.put("animal", "a", "temp", now - 5 * DAY, now, [[now - 10, 1.0]])
+        self.assertEqual(store.ranges("animal", "a", "temp"), [(now - 5 * DAY, now - DAY)])
+        self.assertEqual(store.get("animal", "a", "temp", now - 20, now), [[now - 10, 1.0]])
+
+    def test_incremental_fetch(self):
+        store = SensordataStore(horizon=0)
+        sxapi = LowLevelAPI(public_endpoint=self.PUBLIC_ENDPOINT, api_key=self.API_KEY, store=store)
+
+        def answer(url, params=None, **kwargs):
+            f, t = params["from_date"], params["to_date"]
+            return FakeResponse({"data": [[ts, float(ts)] for ts in range(-(-f // 3600) * 3600, t + 1, 3600)]})
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            data = sxapi.get_animal_sensordata("a", "temp", 10 * DAY + 100, 20 * DAY)
+            self.assertEqual(data[0][0], 10 * DAY + 3600)
+            self.assertEqual(data[-1][0], 20 * DAY)
+            self.assertEqual(len(patched_session.get.call_args_list), 1)
+            data = sxapi.get_animal_sensordata("a", "temp", 11 * DAY, 22 * DAY)
+            call = patched_session.get.call_args_list
+            self.assertEqual(len(call), 2)
+            self.assertEqual(call[1][1]["params"]["from_date"], 21 * DAY)
+            self.assertEqual(data[-1][0], 22 * DAY)
+            self.assertEqual(len(data), 11 * 24 + 1)
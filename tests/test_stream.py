@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import json
+import mock
+import threading
+
+from sxapi.low import LowLevelPublicAPI
+from sxapi.stream import iter_json_array, collect_arrays
+from tests.test_lowapi import FakeResponse
+
+
+def chunked(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamResponse(object):
+    status_code = 200
+    headers = {}
+
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        return iter(chunked(self.text, 7))
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class StreamTests(unittest.TestCase):
+    DOC = {"metric": "temp", "meta": {"data": [1, 2], "unit": "°C"},
+           "data": [[1514764800, 38.51], [1514765400, None], [1514766000, -1.5e-3]],
+           "trailing": "ignored"}
+
+    def test_every_split(self):
+        text = json.dumps(self.DOC, ensure_ascii=False)
+        for size in range(1, len(text.encode("utf-8")) + 1):
+            res = list(iter_json_array(chunked(text, size), key="data"))
+            self.assertEqual(res, self.DOC["data"], size)
+
+    def test_top_level_array(self):
+        text = " [ {\"metric\": \"a\"} , {\"metric\": \"b\"} ] "
+        self.assertEqual([x["metric"] for x in iter_json_array(chunked(text, 3))], ["a", "b"])
+        self.assertEqual(list(iter_json_array(["[]"])), [])
+        self.assertEqual(list(iter_json_array(['{"foo": 1}'], key="data")), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(['{"data": [1, 2'], key="data"))
+
+    def test_collect_arrays(self):
+        ts, values = collect_arrays([[1, 2.0], [2, None]])
+        self.assertEqual(ts.typecode, "q")
+        self.assertEqual(list(ts), [1, 2])
+        self.assertEqual(values[0], 2.0)
+        self.assertTrue(values[1] != values[1])
+
+    def test_api_stream(self):
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+        response = StreamResponse(json.dumps(self.DOC))
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.return_value = response
+            res = list(api.iter_animal_sensordata("myanimal", "temp", 1514764800, 1514766000))
+            call = patched_session.get.call_args_list
+            self.assertTrue(call[0][0][0].endswith("/data/query"))
+            self.assertTrue(call[0][1]["stream"])
+            self.assertEqual(res[0], (1514764800, 38.51))
+            self.assertEqual(len(res), 3)
+            self.assertTrue(response.closed)
+
+    def test_sensordata_model(self):
+        from sxapi.models import Animal
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.return_value = StreamResponse(json.dumps(self.DOC))
+            data = Animal(api=api, _id="myanimal").get_measurements("temp", 1514764800, 1514766000)
+            ts, values = data.to_numpy()
+            self.assertEqual(ts.tolist(), [1514764800, 1514765400, 1514766000])
+            self.assertEqual(len(data), 3)
+            self.assertEqual(list(data)[0], (1514764800, 38.51))
+            series = data.to_series()
+            self.assertEqual(str(series.index[1]), "2018-01-01 00:10:00")
+            self.assertTrue(series.isnull().iloc[1])
+            values[0] = 1.0
+            self.assertEqual(data.arrays[1][0], 1.0)
+            self.assertEqual(patched_session.get.call_count, 1)
+
+    def test_concurrent_windows(self):
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1", max_workers=4)
+        start = 1514764800
+        end = start + 250 * 24 * 60 * 60
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get(url, params=None, **kwargs):
+            # all three windows have to be in flight at once
+            barrier.wait()
+            return StreamResponse(json.dumps({"data": [[params["from_date"], 1.0], [params["to_date"], 2.0]]}))
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = get
+            ts, values = api.get_animal_sensordata_arrays("myanimal", "temp", start, end)
+            self.assertEqual(patched_session.get.call_count, 3)
+            self.assertEqual(list(ts), sorted(ts))
+            self.assertEqual((ts[0], ts[-1]), (start, end))
+            self.assertEqual(list(values), [1.0, 2.0] * 3)
+
+    def test_small_response_decoded(self):
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+        response = FakeResponse(self.DOC, headers={"Content-Length": "120"})
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.return_value = response
+            ts, values = api.get_animal_sensordata_arrays("myanimal", "temp", 1514764800, 1514766000)
+            self.assertTrue(response.closed)
+            self.assertEqual(list(ts), [1514764800, 1514765400, 1514766000])
+            self.assertEqual(ts.typecode, "q")
+            self.assertTrue(values[1] != values[1])
+            # above STREAM_MIN_SIZE the body is streamed
+            response = StreamResponse(json.dumps(self.DOC))
+            response.headers = {"Content-Length": "120"}
+            patched_session.get.return_value = response
+            api.STREAM_MIN_SIZE = 100
+            res = api.get_json_array("/data/query", key="data")
+            self.assertNotIsInstance(res, list)
+            self.assertEqual(list(res), self.DOC["data"])
+
+    def test_get_frame(self):
+        from sxapi import LowLevelAPI
+        from sxapi.models import Animal, Device
+        docs = {"temp": {"data": [[1514764800, 38.5], [1514765400, 38.6]]},
+                "act": {"data": [[1514765400, 1.0], [1514766000, 2.0]]}}
+
+        def answer(url, params=None, **kwargs):
+            return StreamResponse(json.dumps(docs[params["metric"]]))
+
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            frame = Animal(api=api, _id="myanimal").get_frame(["temp", "act"], 1514764800, 1514766000)
+        self.assertEqual(list(frame.columns), ["temp", "act"])
+        self.assertEqual([str(x) for x in frame.index], ["2018-01-01 00:00:00", "2018-01-01 00:10:00",
+                                                         "2018-01-01 00:20:00"])
+        self.assertEqual(frame["temp"].tolist()[:2], [38.5, 38.6])
+        self.assertTrue(frame["temp"].isnull().iloc[2])
+        self.assertEqual(frame["act"].tolist()[1:], [1.0, 2.0])
+
+        sxapi = LowLevelAPI(public_endpoint="http://0.0.0.0:8989/publicapi/v1",
+                            private_endpoint="http://0.0.0.0:8787/internapi/v1", api_key="abcd")
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.return_value = StreamResponse(json.dumps(
+                [{"metric": "act", "data": docs["act"]["data"]}, {"metric": "temp", "data": docs["temp"]["data"]}]))
+            patched_session.get.return_value.content = patched_session.get.return_value.text.encode("utf-8")
+            frame = Device(api=sxapi.publiclow, _id="mydevice").get_frame(["temp", "act"], 1514764800, 1514766000)
+            self.assertEqual(patched_session.get.call_count, 1)
+            self.assertTrue(patched_session.get.call_args[0][0].endswith("/sensordatabulk"))
+        self.assertEqual(frame["temp"].tolist()[:2], [38.5, 38.6])
+        self.assertEqual(frame["act"].tolist()[1:], [1.0, 2.0])
+
+    def test_frame_workers(self):
+        from sxapi.models import Animal
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1",
+                                max_workers=2, pool_maxsize=10)
+        map_concurrent = api.map_concurrent
+        workers = []
+
+        def record(func, items, max_workers=None):
+            workers.append(max_workers)
+            return map_concurrent(func, items, max_workers=max_workers)
+
+        metrics = ["m{}".format(i) for i in range(30)]
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session, \
+                mock.patch.object(api, "map_concurrent", side_effect=record):
+            patched_session.get.side_effect = lambda url, **kwargs: StreamResponse(json.dumps({"data": []}))
+            frame = Animal(api=api, _id="myanimal").get_frame(metrics, 1514764800, 1514766000)
+        # 30 metrics, each with up to 2 connections, share a pool of 10
+        self.assertEqual(workers[0], 5)
+        self.assertEqual(list(frame.columns), metrics)
+
+    def test_organisation_frame(self):
+        from sxapi.models import Organisation
+        docs = {"a1": {"data": [[1514764800, 38.5], [1514765400, 38.6]]},
+                "a2": {"data": [[1514765400, 39.0]]}}
+
+        def answer(url, params=None, **kwargs):
+            if params["animal_id"] == "a3":
+                return FakeResponse({"message": "not found"}, 404)
+            return StreamResponse(json.dumps(docs[params["animal_id"]]))
+
+        progress = []
+        api = LowLevelPublicAPI(api_key="abcd", endpoint="http://0.0.0.0:8989/publicapi/v1")
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.get.side_effect = answer
+            frame, failures = Organisation(api=api, _id="org").get_frame(["temp"], 1514764800, 1514766000,
+                                                                         animal_ids=["a1", "a2", "a3", "a1"],
+                                                                         progress=lambda *x: progress.append(x))
+            calls = patched_session.get.call_count
+            generated, _ = Organisation(api=api, _id="org").get_frame(["temp"], 1514764800, 1514766000,
+                                                                      animal_ids=(x for x in ["a1", "a2"]))
+        self.assertEqual(frame.index.names, ["animal_id", "timestamp"])
+        self.assertEqual(frame.loc["a1", "temp"].tolist(), [38.5, 38.6])
+        self.assertEqual(frame.loc["a2", "temp"].tolist(), [39.0])
+        self.assertEqual(list(failures), ["a3"])
+        # a1 was asked for twice but fetched once
+        self.assertEqual(calls, 3)
+        self.assertEqual(sorted(x[0] for x in progress), [1, 2, 3])
+        self.assertIsNotNone([x for x in progress if x[2] == "a3"][0][3])
+        self.assertEqual(generated.index.tolist(), frame.index.tolist())
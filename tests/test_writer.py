@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import mock
+
+from sxapi import LowLevelAPI
+from sxapi.writer import BufferFullError
+from tests.test_lowapi import FakeResponse
+
+
+class WriterTests(unittest.TestCase):
+    PUBLIC_ENDPOINT = "http://0.0.0.0:8989/publicapi/v1"
+    INTERN_ENDPOINT = "http://0.0.0.0:8787/internapi/v1"
+    API_KEY = "abcd"
+
+    def setUp(self):
+        self.sxapi = LowLevelAPI(private_endpoint=self.INTERN_ENDPOINT, public_endpoint=self.PUBLIC_ENDPOINT,
+                                 api_key=self.API_KEY)
+
+    def test_flush_and_close(self):
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.put.return_value = FakeResponse([{"ok": True}])
+            with self.sxapi.buffered_writer(flush_interval=60) as writer:
+                for i in range(3):
+                    writer.insertSensorData("1234567890", "ph", [(1480773600 + i, 2.0)])
+                writer.insertSensorData("1234567890", "temp", [(1480773600, 38.0)])
+                self.assertTrue(writer.flush())
+                writer.insertEvent("1234567890", "heat", 1480773600, 1, {"x": 1})
+            urls = [x[0][0] for x in patched_session.put.call_args_list]
+            self.assertEqual(urls, [self.INTERN_ENDPOINT + "/sensordatabulk", self.INTERN_ENDPOINT + "/event"])
+            sensordata = patched_session.put.call_args_list[0][1]["json"]["sensordata"]
+            self.assertEqual([(s["metric"], len(s["data"])) for s in sensordata], [("ph", 3), ("temp", 1)])
+            self.assertEqual(patched_session.put.call_args_list[1][1]["json"]["metadata"], {"x": 1, "value": 1})
+            self.assertEqual((writer.written_points, writer.written_events), (4, 1))
+            with self.assertRaises(ValueError):
+                writer.insertEvent("1234567890", "heat", 1480773600, 1, {})
+
+    def test_size_threshold_and_errors(self):
+        errors = []
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.put.return_value = FakeResponse({"message": "invalid"}, 422)
+            writer = self.sxapi.buffered_writer(max_points=2, flush_interval=60,
+                                                on_error=lambda e, s, ev: errors.append(s))
+            writer.insertSensorData("1234567890", "ph", [(1480773600, 2.0), (1480773601, 2.0)])
+            writer.flush()
+            writer.close()
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(errors[0][0]["data"], [(1480773600, 2.0), (1480773601, 2.0)])
+            self.assertEqual((writer.errors, writer.written_points), (1, 0))
+
+    def test_backpressure(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def answer(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return FakeResponse([{"ok": True}])
+
+        with mock.patch('sxapi.low.BaseAPI.session') as patched_session:
+            patched_session.put.side_effect = answer
+            writer = self.sxapi.buffered_writer(max_points=1, max_buffer=2, flush_interval=60)
+            writer.insertSensorData("1234567890", "ph", [(1480773600, 2.0)])
+            started.wait(5)
+            writer.insertSensorData("1234567890", "ph", [(1480773601, 2.0)])
+            with self.assertRaises(BufferFullError):
+                writer.insertSensorData("1234567890", "ph", [(1480773602, 2.0)], timeout=0.1)
+            release.set()
+            writer.insertSensorData("1234567890", "ph", [(1480773602, 2.0)], timeout=5)
+            writer.close()
+            self.assertEqual(writer.written_points, 3)